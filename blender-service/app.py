@@ -1,12 +1,140 @@
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from flask import Flask, jsonify, request, send_file
 import tempfile
+import threading
+import time
 import uuid
 import os
 import json
 
 app = Flask(__name__)
 
+# Blender is CPU-bound: cap how many run at once (sync and async requests share the pool).
+BLENDER_WORKERS = max(1, int(os.getenv("BLENDER_WORKERS", "1")))
+BLENDER_TIMEOUT_SEC = 60
+# Finished async jobs (and their STLs) are kept this long for the client to fetch.
+JOB_TTL_SEC = int(os.getenv("BLENDER_JOB_TTL_SEC", "3600"))
+# Sync /generate-stl holds its request thread until Blender finishes. Keep this below
+# gunicorn's --threads (4) so health checks and /jobs/<id> polls always get a thread,
+# and give up before gunicorn's --timeout (120) kills the worker.
+BLENDER_SYNC_SLOTS = max(1, int(os.getenv("BLENDER_SYNC_SLOTS", "2")))
+BLENDER_SYNC_WAIT_SEC = int(os.getenv("BLENDER_SYNC_WAIT_SEC", "100"))
+# Async jobs queued or running at once; beyond this new ones get a 503 instead of
+# piling up in the pool's (unbounded) queue with an input file each in /tmp.
+BLENDER_MAX_PENDING = max(1, int(os.getenv("BLENDER_MAX_PENDING", "20")))
+
+_POOL = ThreadPoolExecutor(max_workers=BLENDER_WORKERS, thread_name_prefix="blender")
+_SYNC_SLOTS = threading.BoundedSemaphore(BLENDER_SYNC_SLOTS)
+_JOBS = {}  # job id -> {"status", "created", "output_path", "error", ...}
+_JOBS_LOCK = threading.Lock()
+
+
+def _write_input(data):
+    """Validate the request JSON and write Blender's input file; returns (input_path, output_path) or an error response."""
+    vertices = data.get("vertices", [])
+    neckline = data.get("neckline", [])
+    overlay = data.get("overlay", "default")
+    job_id = data.get("job_id", uuid.uuid4().hex[:8])  # fallback UUID if not provided
+
+    if not vertices:
+        return None, (jsonify({"error": "No vertices provided"}), 400)
+
+    temp_id = uuid.uuid4().hex[:8]
+    input_path = f"/tmp/input_{temp_id}.json"
+    output_path = f"/tmp/output_{temp_id}.stl"
+
+    # Write full payload with overlay & job_id
+    with open(input_path, "w") as f:
+        json.dump({
+            "vertices": vertices,
+            "neckline": neckline,
+            "overlay": overlay,
+            "job_id": job_id
+        }, f)
+
+    return (input_path, output_path), None
+
+
+def _run_blender(input_path, output_path):
+    """Run generate_stl.py headless; returns an error dict, or None when the STL was written."""
+    print(f"📦 Calling Blender with input: {input_path}, output: {output_path}")
+
+    try:
+        result = subprocess.run([
+            "blender", "--background", "--python", "generate_stl.py", "--",
+            input_path, output_path
+        ], capture_output=True, text=True, timeout=BLENDER_TIMEOUT_SEC)
+    except subprocess.TimeoutExpired:
+        return {"error": "Blender timed out", "code": 504}
+    finally:
+        try:
+            os.remove(input_path)
+        except OSError:
+            pass
+
+    print("✅ Blender STDOUT:\n", result.stdout)
+    print("⚠️ Blender STDERR:\n", result.stderr)
+
+    if result.returncode != 0:
+        return {"error": "Blender failed", "stderr": result.stderr, "stdout": result.stdout, "code": 500}
+
+    if not os.path.exists(output_path):
+        return {"error": "STL not created", "stderr": result.stderr, "code": 500}
+
+    return None
+
+
+def _busy(message="Blender busy, retry later or use /generate-stl-async"):
+    return jsonify({"error": message}), 503, {"Retry-After": "10"}
+
+
+def _discard_output(future, output_path):
+    """Remove the STL of a sync run whose caller already gave up on it."""
+    def _cleanup(_):
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+    future.add_done_callback(_cleanup)
+
+
+def _pending_jobs():
+    """Async jobs still queued or running; call with _JOBS_LOCK held."""
+    return sum(1 for job in _JOBS.values() if job["status"] in ("queued", "running"))
+
+
+def _prune_jobs():
+    # Expire by finish time: a job that queued or ran past the TTL still gets its full window.
+    cutoff = time.time() - JOB_TTL_SEC
+    with _JOBS_LOCK:
+        stale = [jid for jid, job in _JOBS.items() if job["status"] in ("done", "failed") and job["finished"] < cutoff]
+        for jid in stale:
+            job = _JOBS.pop(jid)
+            try:
+                os.remove(job["output_path"])
+            except OSError:
+                pass
+
+
+def _run_job(jid, input_path, output_path):
+    with _JOBS_LOCK:
+        _JOBS[jid]["status"] = "running"
+    try:
+        err = _run_blender(input_path, output_path)
+    except Exception as e:
+        err = {"error": str(e), "code": 500}
+    with _JOBS_LOCK:
+        job = _JOBS[jid]
+        if err:
+            job["status"] = "failed"
+            job["error"] = err
+        else:
+            job["status"] = "done"
+        job["finished"] = time.time()
+    print(f"🧵 Blender job {jid} {job['status']}")
+
+
 # ✅ Health check for Render
 @app.route("/")
 def health():
@@ -24,54 +152,103 @@ def blender_version():
 def generate_stl():
     try:
         data = request.get_json()
-        print("🛬 Received JSON:", data)
-
-        vertices = data.get("vertices", [])
-        neckline = data.get("neckline", [])
-        overlay = data.get("overlay", "default")
-        job_id = data.get("job_id", uuid.uuid4().hex[:8])  # fallback UUID if not provided
+        print("🛬 Received JSON keys:", sorted((data or {}).keys()))
 
-        if not vertices:
-            return jsonify({"error": "No vertices provided"}), 400
+        # With every worker already taken by async jobs, this call would only queue
+        # behind them until BLENDER_SYNC_WAIT_SEC runs out; say so up front instead.
+        with _JOBS_LOCK:
+            saturated = _pending_jobs() >= BLENDER_WORKERS
+        if saturated or not _SYNC_SLOTS.acquire(blocking=False):
+            return _busy()
+        try:
+            paths, error = _write_input(data)
+            if error:
+                return error
+            input_path, output_path = paths
 
-        temp_id = uuid.uuid4().hex[:8]
-        input_path = f"/tmp/input_{temp_id}.json"
-        output_path = f"/tmp/output_{temp_id}.stl"
+            # Runs on the shared pool so concurrent requests queue instead of oversubscribing the CPU.
+            future = _POOL.submit(_run_blender, input_path, output_path)
+            try:
+                err = future.result(timeout=BLENDER_SYNC_WAIT_SEC)
+            except FutureTimeout:
+                if future.cancel():
+                    try:
+                        os.remove(input_path)
+                    except OSError:
+                        pass
+                else:
+                    _discard_output(future, output_path)
+                print(f"⏳ Sync Blender request gave up after {BLENDER_SYNC_WAIT_SEC}s")
+                return _busy()
+        finally:
+            _SYNC_SLOTS.release()
 
-        # Write full payload with overlay & job_id
-        with open(input_path, "w") as f:
-            json.dump({
-                "vertices": vertices,
-                "neckline": neckline,
-                "overlay": overlay,
-                "job_id": job_id
-            }, f)
+        if err:
+            code = err.pop("code")
+            return jsonify(err), code
 
-        print(f"📦 Calling Blender with input: {input_path}, output: {output_path}")
+        return send_file(output_path, mimetype="application/octet-stream", as_attachment=True, download_name="mold.stl")
 
-        result = subprocess.run([
-            "blender", "--background", "--python", "generate_stl.py", "--",
-            input_path, output_path
-        ], capture_output=True, text=True, timeout=60)
+    except subprocess.CalledProcessError as e:
+        return jsonify({"error": f"Blender crashed", "details": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        print("✅ Blender STDOUT:\n", result.stdout)
-        print("⚠️ Blender STDERR:\n", result.stderr)
+@app.route("/generate-stl-async", methods=["POST"])
+def generate_stl_async():
+    """Queue a Blender run and return immediately; poll /jobs/<id>, then fetch /jobs/<id>/stl."""
+    try:
+        data = request.get_json()
+        print("🛬 Received async JSON keys:", sorted((data or {}).keys()))
 
-        if result.returncode != 0:
-            return jsonify({
-                "error": "Blender failed",
-                "stderr": result.stderr,
-                "stdout": result.stdout
-            }), 500
+        _prune_jobs()
+        jid = uuid.uuid4().hex
+        # Reserve the slot before writing the input file, so a burst can't overshoot the cap.
+        with _JOBS_LOCK:
+            full = _pending_jobs() >= BLENDER_MAX_PENDING
+            if not full:
+                _JOBS[jid] = {"status": "queued", "created": time.time(), "output_path": None, "error": None}
+        if full:
+            return _busy(f"Blender queue full ({BLENDER_MAX_PENDING} jobs), retry later")
 
-        if not os.path.exists(output_path):
-            return jsonify({"error": "STL not created", "stderr": result.stderr}), 500
+        paths, error = None, None
+        try:
+            paths, error = _write_input(data)
+        finally:
+            if error or not paths:
+                with _JOBS_LOCK:
+                    _JOBS.pop(jid, None)
+        if error:
+            return error
+        input_path, output_path = paths
 
-        return send_file(output_path, mimetype="application/octet-stream", as_attachment=True, download_name="mold.stl")
+        with _JOBS_LOCK:
+            _JOBS[jid]["output_path"] = output_path
+        _POOL.submit(_run_job, jid, input_path, output_path)
 
-    except subprocess.TimeoutExpired:
-        return jsonify({"error": "Blender timed out"}), 504
-    except subprocess.CalledProcessError as e:
-        return jsonify({"error": f"Blender crashed", "details": str(e)}), 500
+        return jsonify({"job": jid, "status": "queued", "status_url": f"/jobs/{jid}", "stl_url": f"/jobs/{jid}/stl"}), 202
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@app.route("/jobs/<jid>")
+def job_status(jid):
+    with _JOBS_LOCK:
+        job = _JOBS.get(jid)
+        if job is None:
+            return jsonify({"error": "Unknown job"}), 404
+        body = {"job": jid, "status": job["status"]}
+        if job["error"]:
+            body["error"] = {k: v for k, v in job["error"].items() if k != "code"}
+    return jsonify(body)
+
+@app.route("/jobs/<jid>/stl")
+def job_stl(jid):
+    with _JOBS_LOCK:
+        job = _JOBS.get(jid)
+        status = job["status"] if job else None
+        output_path = job["output_path"] if job else None
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if status != "done":
+        return jsonify({"job": jid, "status": status}), 409
+    return send_file(output_path, mimetype="application/octet-stream", as_attachment=True, download_name="mold.stl")
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import re
 import uuid
 import json
 import time
@@ -11,6 +12,15 @@ import traceback
 import hmac
 import hashlib
 import shutil
+import heapq
+import random
+import atexit
+import signal
+import logging
+import sqlite3
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
@@ -18,22 +28,173 @@ try:
     from zoneinfo import ZoneInfo
 except Exception:
     ZoneInfo = None  # fallback to UTC day boundaries
+
+try:
+    import redis
+except Exception:
+    redis = None  # only required when REDIS_URL / ORDER_STORE_BACKEND=redis is set
+
+try:
+    from streaming_form_data import StreamingFormDataParser
+    from streaming_form_data.targets import FileTarget, ValueTarget
+except Exception:
+    StreamingFormDataParser = None  # fall back to Werkzeug's multipart parser
+
+try:
+    import orjson
+except Exception:
+    orjson = None  # stdlib json is used when orjson isn't installed
 from typing import Any, Dict, List, Optional, Tuple
 
 import fcntl
 import requests
 import stripe
-from flask import Flask, request, jsonify, send_file, abort, make_response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, request, jsonify, abort, make_response
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.routing import BaseConverter
+from werkzeug.wsgi import wrap_file
 
 APP_VERSION = "KrezzServer/2.0.4-admin-protection"
 
 app = Flask(__name__)
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson (same key sorting / fallbacks as the default)."""
+
+    def _option(self) -> int:
+        opt = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            opt |= orjson.OPT_SORT_KEYS
+        return opt
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._option()).decode("utf-8")
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._option())
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+# ----------------------------
+# Logging
+# ----------------------------
+# One line per record with level + timestamp; LOG_LEVEL=WARNING silences the
+# per-request chatter in production without touching call sites.
+logging.basicConfig(
+    level=getattr(logging, (os.getenv("LOG_LEVEL") or "INFO").strip().upper(), logging.INFO),
+    format="%(asctime)s %(levelname)s %(message)s",
+)
+log = logging.getLogger("krezz")
+
+# Response/body dumps at INFO are cut to this many bytes; DEBUG gets the full dump.
+LOG_PREVIEW_BYTES = 256
+
+
+class _RateLimitFilter(logging.Filter):
+    """
+    Let at most `per_sec` INFO-or-lower records per message template through
+    each second, so a webhook burst can't turn into a stdout burst. Warnings
+    and errors always pass. The first record of the next window notes how many
+    were dropped.
+    """
+
+    def __init__(self, per_sec: int):
+        super().__init__()
+        self.per_sec = per_sec
+        self._mu = threading.Lock()
+        self._windows: Dict[Tuple[str, int], List[int]] = {}  # key -> [second, passed, dropped]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (str(record.msg), record.levelno)
+        now = int(time.monotonic())
+        with self._mu:
+            w = self._windows.get(key)
+            if w is None or w[0] != now:
+                dropped = w[2] if w else 0
+                self._windows[key] = [now, 1, 0]
+                if dropped:
+                    record.msg = f"{record.msg} [{dropped} similar suppressed]"
+                return True
+            if w[1] < self.per_sec:
+                w[1] += 1
+                return True
+            w[2] += 1
+            return False
+
+
+try:
+    _log_rate = int(os.getenv("LOG_RATE_LIMIT_PER_SEC") or "20")
+except ValueError:
+    _log_rate = 20
+if _log_rate > 0:
+    log.addFilter(_RateLimitFilter(_log_rate))
+
 # ----------------------------
 # Utils
 # ----------------------------
+def utc_now() -> datetime:
+    """Naive UTC now (the stored "...Z" timestamps are naive UTC); avoids deprecated utcnow()."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 def utc_iso() -> str:
-    return datetime.utcnow().isoformat() + "Z"
+    return utc_now().isoformat() + "Z"
+
+
+def utc_iso_from_ts(ts: int) -> str:
+    """Unix seconds -> "YYYY-MM-DDTHH:MM:SS" + "Z" (same shape as utc_iso(), no microseconds)."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+def json_bytes(obj: Any) -> bytes:
+    """Serialize to compact JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode("utf-8")
+
+
+def json_text(obj: Any) -> str:
+    """Compact JSON text for logs / Redis values; unknown types fall back to str()."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+def json_parse(raw: Any) -> Any:
+    """Parse JSON from bytes/str (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def fsync_dir(dirpath: str) -> None:
+    """
+    fsync a directory so a rename into it survives a crash; os.replace() alone
+    only makes the swap atomic, not durable. Best effort (not every FS allows it).
+    """
+    try:
+        fd = os.open(dirpath or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 
 def env_str(name: str, default: str = "") -> str:
@@ -63,15 +224,21 @@ def mask_secret(s: str, keep: int = 4) -> str:
     return f"{s[:keep]}…{s[-keep:]}"
 
 
+# Spelled-out country names we accept; anything else that isn't ISO2 falls back to US.
+_COUNTRY_ISO2 = {
+    "usa": "US",
+    "united states": "US",
+    "united states of america": "US",
+}
+
+
 def normalize_country_iso2(country_val: str) -> str:
     if not country_val:
         return "US"
-    c = country_val.strip().lower()
-    if c in ("us", "usa", "united states", "united states of america"):
-        return "US"
-    if len(country_val.strip()) == 2:
-        return country_val.strip().upper()
-    return "US"
+    c = country_val.strip()
+    if len(c) == 2:
+        return c.upper()
+    return _COUNTRY_ISO2.get(c.lower(), "US")
 
 
 def req_id() -> str:
@@ -117,8 +284,20 @@ class Config:
 
     public_base_url: str
     upload_dir: str
+    max_upload_bytes: int
+    # Internal nginx location that aliases UPLOAD_DIR; empty = stream STLs from Flask
+    stl_accel_redirect_prefix: str
+    # Apache mod_xsendfile / lighttpd: hand the STL's absolute path to the proxy
+    stl_use_x_sendfile: bool
     order_data_path: str
 
+    # Order storage backend: "file" (order_data.json), "sqlite" or "redis" (REDIS_URL)
+    order_store_backend: str
+    redis_url: str
+    order_sqlite_path: str
+    # File backend only: >0 keeps orders in memory and flushes at most this often
+    order_flush_interval_sec: float
+
     stripe_success_url_tmpl: str
     stripe_cancel_url_tmpl: str
 
@@ -134,6 +313,11 @@ class Config:
     slant_filaments_endpoint: str
     slant_orders_endpoint: str
     slant_timeout_sec: int
+    slant_connect_timeout_sec: int
+    slant_max_rps: float
+    slant_upload_concurrency: int
+    slant_breaker_failures: int
+    slant_breaker_reset_sec: int
 
     slant_file_url_field: str
     slant_stl_route: str
@@ -174,10 +358,37 @@ class Config:
 
         upload_dir = env_str("UPLOAD_DIR", "/data/uploads")
         os.makedirs(upload_dir, exist_ok=True)
+        max_upload_bytes = safe_int(env_str("MAX_UPLOAD_MB", "200"), 200) * 1024 * 1024
+
+        # Only set when nginx fronts gunicorn, e.g. STL_ACCEL_REDIRECT_PREFIX=/internal-stl with
+        #   location /internal-stl/ { internal; alias /data/uploads/; sendfile on; tcp_nopush on; }
+        stl_accel_redirect_prefix = env_str("STL_ACCEL_REDIRECT_PREFIX").rstrip("/")
+        # Same idea for proxies that understand X-Sendfile (Apache mod_xsendfile, lighttpd).
+        stl_use_x_sendfile = env_bool("USE_X_SENDFILE", False)
 
         order_data_path = env_str("ORDER_DATA_PATH", "/data/order_data.json")
         os.makedirs(os.path.dirname(order_data_path), exist_ok=True)
 
+        # Redis stores each order as a hash, so an update only rewrites the
+        # fields that changed instead of the whole order_data.json file.
+        redis_url = env_str("REDIS_URL")
+        order_store_backend = env_str("ORDER_STORE_BACKEND", "redis" if redis_url else "file").lower()
+        if order_store_backend not in ("file", "sqlite", "redis"):
+            raise ValueError(f"Unsupported ORDER_STORE_BACKEND: {order_store_backend} (use file, sqlite or redis)")
+        if order_store_backend == "redis" and not redis_url:
+            raise ValueError("ORDER_STORE_BACKEND=redis requires REDIS_URL")
+
+        # SQLite keeps one row per order, so a webhook rewrites ~1-3 KB instead of the whole file.
+        order_sqlite_path = env_str("ORDER_SQLITE_PATH") or (
+            re.sub(r"\.json$", "", order_data_path) + ".sqlite"
+        )
+
+        # Debounced order_data.json writes (single worker only; see BufferedOrderStore).
+        try:
+            order_flush_interval_sec = max(0.0, float(env_str("ORDER_FLUSH_INTERVAL_SEC", "0")))
+        except ValueError:
+            order_flush_interval_sec = 0.0
+
         # ✅ NEW: Daily quota config (cap orders/day)
         daily_order_cap = safe_int(env_str("SLANT_DAILY_ORDER_CAP", "100"), 100)
 
@@ -207,6 +418,17 @@ class Config:
         slant_filaments_endpoint = env_str("SLANT_FILAMENTS_ENDPOINT", f"{slant_base_url}/filaments")
         slant_orders_endpoint = env_str("SLANT_ORDERS_ENDPOINT", f"{slant_base_url}/orders")
         slant_timeout_sec = safe_int(env_str("SLANT_TIMEOUT_SEC", "240"), 240)
+        # Kept short so an unreachable endpoint fails fast; reads stay long for large STLs.
+        slant_connect_timeout_sec = safe_int(env_str("SLANT_CONNECT_TIMEOUT_SEC", "3"), 3)
+        try:
+            slant_max_rps = float(env_str("SLANT_MAX_RPS", "5"))
+        except ValueError:
+            slant_max_rps = 5.0
+        # Parallel STL uploads per order (1 = sequential); capped at the HTTP pool's headroom.
+        slant_upload_concurrency = min(8, max(1, safe_int(env_str("SLANT_UPLOAD_CONCURRENCY", "4"), 4)))
+        # Circuit breaker: fail fast for RESET_SEC after N consecutive connect errors / 5xx (0 = off).
+        slant_breaker_failures = max(0, safe_int(env_str("SLANT_BREAKER_FAILURES", "5"), 5))
+        slant_breaker_reset_sec = max(1, safe_int(env_str("SLANT_BREAKER_RESET_SEC", "60"), 60))
 
         slant_enabled = bool(slant_api_key)
         slant_debug = env_bool("SLANT_DEBUG", False)
@@ -240,7 +462,14 @@ class Config:
             stripe_endpoint_secret=stripe_endpoint_secret,
             public_base_url=public_base_url,
             upload_dir=upload_dir,
+            max_upload_bytes=max_upload_bytes,
+            stl_accel_redirect_prefix=stl_accel_redirect_prefix,
+            stl_use_x_sendfile=stl_use_x_sendfile,
             order_data_path=order_data_path,
+            order_store_backend=order_store_backend,
+            redis_url=redis_url,
+            order_sqlite_path=order_sqlite_path,
+            order_flush_interval_sec=order_flush_interval_sec,
             stripe_success_url_tmpl=success_tmpl,
             stripe_cancel_url_tmpl=cancel_tmpl,
             slant_enabled=slant_enabled,
@@ -254,6 +483,11 @@ class Config:
             slant_filaments_endpoint=slant_filaments_endpoint,
             slant_orders_endpoint=slant_orders_endpoint,
             slant_timeout_sec=slant_timeout_sec,
+            slant_connect_timeout_sec=slant_connect_timeout_sec,
+            slant_max_rps=slant_max_rps,
+            slant_upload_concurrency=slant_upload_concurrency,
+            slant_breaker_failures=slant_breaker_failures,
+            slant_breaker_reset_sec=slant_breaker_reset_sec,
             slant_file_url_field=slant_file_url_field,
             slant_stl_route=slant_stl_route,
             slant_send_bearer=slant_send_bearer,
@@ -272,45 +506,95 @@ class Config:
 
         )
 
-        print("✅ Boot config:")
-        print("   PUBLIC_BASE_URL:", cfg.public_base_url)
-        print("   UPLOAD_DIR:", cfg.upload_dir)
-        print("   ORDER_DATA_PATH:", cfg.order_data_path)
-        print("   STRIPE_SUCCESS_URL:", cfg.stripe_success_url_tmpl)
-        print("   STRIPE_CANCEL_URL:", cfg.stripe_cancel_url_tmpl)
-        print("   SLANT_ENABLED:", cfg.slant_enabled)
-        print("   SLANT_AUTO_SUBMIT:", cfg.slant_auto_submit)
-        print("   SLANT_REQUIRE_LIVE_STRIPE:", cfg.slant_require_live_stripe)
-        print("   SLANT_BASE_URL:", cfg.slant_base_url)
-        print("   SLANT_FILES_ENDPOINT:", cfg.slant_files_endpoint)
-        print("   SLANT_FILAMENTS_ENDPOINT:", cfg.slant_filaments_endpoint)
-        print("   SLANT_ORDERS_ENDPOINT:", cfg.slant_orders_endpoint)
-        print("   SLANT_TIMEOUT_SEC:", cfg.slant_timeout_sec)
-        print("   SLANT_FILE_URL_FIELD:", cfg.slant_file_url_field)
-        print("   SLANT_STL_ROUTE:", cfg.slant_stl_route)
-        print("   SLANT_SEND_BEARER:", cfg.slant_send_bearer)
-        print("   REQUIRE_STL_BEFORE_CHECKOUT:", cfg.require_stl_before_checkout)
-        print("   AUTO_SUBMIT_ON_UPLOAD_IF_PAID:", cfg.auto_submit_on_upload_if_paid)
-        print("   SLANT_API_KEY:", mask_secret(cfg.slant_api_key))
-        print("   SLANT_PLATFORM_ID:", mask_secret(cfg.slant_platform_id))
-        print("   SLANT_WEBHOOK_SECRET:", mask_secret(cfg.slant_webhook_secret))
-        print("   SLANT_DAILY_ORDER_CAP:", cfg.daily_order_cap)
-        print("   DAILY_QUOTA_PATH:", cfg.quota_data_path)
-        print("   DAILY_QUOTA_TZ:", cfg.quota_tz)
-        print("   MONITOR_CONFIGURED:", bool(cfg.monitor_api_key))
-        print("   MONITOR_STUCK_MINUTES:", cfg.monitor_stuck_minutes)
-        print("   MONITOR_LOOKBACK_HOURS:", cfg.monitor_lookback_hours)
-        print("   ADMIN_CONFIGURED:", bool(cfg.admin_api_key))
+        log.info("✅ Boot config:")
+        log.info("   PUBLIC_BASE_URL: %s", cfg.public_base_url)
+        log.info("   UPLOAD_DIR: %s", cfg.upload_dir)
+        log.info("   MAX_UPLOAD_MB: %s", cfg.max_upload_bytes // (1024 * 1024))
+        log.info("   STL_ACCEL_REDIRECT_PREFIX: %s", cfg.stl_accel_redirect_prefix or "(off)")
+        log.info("   USE_X_SENDFILE: %s", cfg.stl_use_x_sendfile)
+        log.info("   ORDER_DATA_PATH: %s", cfg.order_data_path)
+        log.info("   ORDER_STORE_BACKEND: %s", cfg.order_store_backend)
+        log.info("   REDIS_CONFIGURED: %s", bool(cfg.redis_url))
+        if cfg.order_store_backend == "sqlite":
+            log.info("   ORDER_SQLITE_PATH: %s", cfg.order_sqlite_path)
+        log.info("   ORDER_FLUSH_INTERVAL_SEC: %s", cfg.order_flush_interval_sec or "(write-through)")
+        log.info("   STRIPE_SUCCESS_URL: %s", cfg.stripe_success_url_tmpl)
+        log.info("   STRIPE_CANCEL_URL: %s", cfg.stripe_cancel_url_tmpl)
+        log.info("   SLANT_ENABLED: %s", cfg.slant_enabled)
+        log.info("   SLANT_AUTO_SUBMIT: %s", cfg.slant_auto_submit)
+        log.info("   SLANT_REQUIRE_LIVE_STRIPE: %s", cfg.slant_require_live_stripe)
+        log.info("   SLANT_BASE_URL: %s", cfg.slant_base_url)
+        log.info("   SLANT_FILES_ENDPOINT: %s", cfg.slant_files_endpoint)
+        log.info("   SLANT_FILAMENTS_ENDPOINT: %s", cfg.slant_filaments_endpoint)
+        log.info("   SLANT_ORDERS_ENDPOINT: %s", cfg.slant_orders_endpoint)
+        log.info("   SLANT_TIMEOUT_SEC: %s", cfg.slant_timeout_sec)
+        log.info("   SLANT_CONNECT_TIMEOUT_SEC: %s", cfg.slant_connect_timeout_sec)
+        log.info("   SLANT_MAX_RPS: %s", cfg.slant_max_rps)
+        log.info("   SLANT_UPLOAD_CONCURRENCY: %s", cfg.slant_upload_concurrency)
+        log.info("   SLANT_BREAKER: %s failures / %ss", cfg.slant_breaker_failures, cfg.slant_breaker_reset_sec)
+        log.info("   SLANT_FILE_URL_FIELD: %s", cfg.slant_file_url_field)
+        log.info("   SLANT_STL_ROUTE: %s", cfg.slant_stl_route)
+        log.info("   SLANT_SEND_BEARER: %s", cfg.slant_send_bearer)
+        log.info("   REQUIRE_STL_BEFORE_CHECKOUT: %s", cfg.require_stl_before_checkout)
+        log.info("   AUTO_SUBMIT_ON_UPLOAD_IF_PAID: %s", cfg.auto_submit_on_upload_if_paid)
+        log.info("   SLANT_API_KEY: %s", mask_secret(cfg.slant_api_key))
+        log.info("   SLANT_PLATFORM_ID: %s", mask_secret(cfg.slant_platform_id))
+        log.info("   SLANT_WEBHOOK_SECRET: %s", mask_secret(cfg.slant_webhook_secret))
+        log.info("   SLANT_DAILY_ORDER_CAP: %s", cfg.daily_order_cap)
+        log.info("   DAILY_QUOTA_PATH: %s", cfg.quota_data_path)
+        log.info("   DAILY_QUOTA_TZ: %s", cfg.quota_tz)
+        log.info("   MONITOR_CONFIGURED: %s", bool(cfg.monitor_api_key))
+        log.info("   MONITOR_STUCK_MINUTES: %s", cfg.monitor_stuck_minutes)
+        log.info("   MONITOR_LOOKBACK_HOURS: %s", cfg.monitor_lookback_hours)
+        log.info("   ADMIN_CONFIGURED: %s", bool(cfg.admin_api_key))
 
         return cfg
 
 
 CFG = Config.load()
 stripe.api_key = CFG.stripe_secret_key
+app.config["MAX_CONTENT_LENGTH"] = CFG.max_upload_bytes
 
 HTTP = requests.Session()
 HTTP.headers.update({"User-Agent": APP_VERSION})
 
+# Keep-alive pool for plain outbound calls (STL URL probes) so repeated calls skip
+# the TLS handshake. pool_maxsize matches gunicorn's --threads 32, so every request
+# thread can hold a warm connection to the same host without urllib3 discarding extras.
+# Retry only replays idempotent methods (GET/HEAD/...). Slant is not on this adapter:
+# SLANT has a non-retrying one so slant_request() stays its only retry layer.
+_HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    ),
+)
+HTTP.mount("https://", _HTTP_ADAPTER)
+HTTP.mount("http://", _HTTP_ADAPTER)
+
+# Presigned S3 PUTs: pooled too (an order's STLs go to the same bucket), but with
+# no adapter retries - a replay would resend an already-consumed file stream.
+S3_UPLOAD = requests.Session()
+S3_UPLOAD.headers.update({"User-Agent": APP_VERSION})
+_S3_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+S3_UPLOAD.mount("https://", _S3_ADAPTER)
+S3_UPLOAD.mount("http://", _S3_ADAPTER)
+
+# Stripe calls (Session.create / retrieve) block a gthread for a full round trip, so
+# give every thread a warm connection from one shared pool instead of stripe-python's
+# per-thread sessions. Retries are left to Stripe's client, which adds idempotency
+# keys to retried POSTs (Session.create also passes its own).
+_STRIPE_SESSION = requests.Session()
+_STRIPE_ADAPTER = HTTPAdapter(pool_connections=2, pool_maxsize=32, max_retries=0)
+_STRIPE_SESSION.mount("https://", _STRIPE_ADAPTER)
+stripe.default_http_client = stripe.RequestsClient(timeout=(5, 80), session=_STRIPE_SESSION)
+stripe.max_network_retries = 2
+
 
 def build_success_url(order_id: str) -> str:
     return CFG.stripe_success_url_tmpl.replace("{ORDER_ID}", order_id)
@@ -320,12 +604,41 @@ def build_cancel_url(order_id: str) -> str:
     return CFG.stripe_cancel_url_tmpl.replace("{ORDER_ID}", order_id)
 
 
+# job_id / order_id are client-supplied and end up in file paths: letters,
+# digits, "_" and "-" only (UUIDs fit), so "../" can never escape UPLOAD_DIR.
+SAFE_ID_PATTERN = r"[A-Za-z0-9_-]{1,128}"
+_SAFE_ID_RE = re.compile(SAFE_ID_PATTERN)
+
+
+def is_safe_id(value: str) -> bool:
+    return bool(value) and _SAFE_ID_RE.fullmatch(value) is not None
+
+
+class SafeIdConverter(BaseConverter):
+    """URL converter so Werkzeug rejects malformed ids (404) before the view runs."""
+
+    regex = SAFE_ID_PATTERN
+
+
+app.url_map.converters["safe_id"] = SafeIdConverter
+
+
 def stl_path_for(job_id: str) -> str:
+    if not is_safe_id(job_id):
+        raise ValueError(f"Invalid job_id: {job_id!r}")
     return os.path.join(CFG.upload_dir, f"{job_id}.stl")
 
 
+# Base of the STL URLs handed out (SLANT_STL_ROUTE picks /stl-full or /stl-raw).
+STL_PUBLIC_URL_PREFIX = f"{CFG.public_base_url}/{'stl-full' if CFG.slant_stl_route == 'full' else 'stl-raw'}"
+
+
+def stl_public_url(job_id: str) -> str:
+    return f"{STL_PUBLIC_URL_PREFIX}/{job_id}.stl"
+
+
 def stl_exists(job_id: str) -> bool:
-    return os.path.exists(stl_path_for(job_id))
+    return is_safe_id(job_id) and os.path.exists(stl_path_for(job_id))
 
 
 # ----------------------------
@@ -345,20 +658,24 @@ class OrderStore:
     def _read_unlocked(self) -> Dict[str, Any]:
         if not os.path.exists(self.path):
             return {}
-        with open(self.path, "r") as f:
+        with open(self.path, "rb") as f:
             raw = f.read().strip()
-            return json.loads(raw) if raw else {}
+            return json_parse(raw) if raw else {}
 
     def _write_unlocked(self, data: Dict[str, Any]) -> None:
+        self._replace_file(json_bytes(data))
+
+    def _replace_file(self, raw: bytes) -> None:
         dirpath = os.path.dirname(self.path)
         os.makedirs(dirpath, exist_ok=True)
         fd, tmp_path = tempfile.mkstemp(prefix="order_data_", suffix=".json", dir=dirpath)
         try:
-            with os.fdopen(fd, "w") as tmp:
-                json.dump(data, tmp)
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(raw)
                 tmp.flush()
                 os.fsync(tmp.fileno())
             os.replace(tmp_path, self.path)
+            fsync_dir(dirpath)
         finally:
             try:
                 if os.path.exists(tmp_path):
@@ -403,6 +720,7 @@ class OrderStore:
         lf = self._lock()
         try:
             data = self._read_unlocked()
+            order_obj["updated_at"] = utc_iso()
             data[order_id] = order_obj
             self._write_unlocked(data)
         finally:
@@ -420,12 +738,27 @@ class OrderStore:
             new_order, changed = fn(dict(order))
             data[order_id] = new_order
             if changed:
+                new_order["updated_at"] = utc_iso()
                 self._write_unlocked(data)
             return new_order, changed
         finally:
             fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
             lf.close()
 
+    def ids_by_status(self, status: str) -> List[str]:
+        """Order ids currently in `status` (one file read; the other backends index this)."""
+        lf = self._lock()
+        try:
+            data = self._read_unlocked() or {}
+            return [
+                str(oid)
+                for oid, obj in data.items()
+                if isinstance(obj, dict) and obj.get("status") == status
+            ]
+        finally:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+            lf.close()
+
     # ✅ NEW: Find internal order_id by Slant public order id (SLANT_...).
     def find_by_slant_public_order_id(self, public_id: str) -> Optional[str]:
         public_id = (public_id or "").strip()
@@ -452,6 +785,540 @@ class OrderStore:
             fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
             lf.close()
 
+
+class BufferedOrderStore(OrderStore):
+    """
+    File-backed OrderStore that keeps orders in memory and logs each change
+    to an append-only WAL next to the snapshot (order_data.json.log).
+
+    A write appends one line - {"order_id": ..., "order": {...}} - for the
+    order that changed instead of rewriting every order. A background thread
+    fsyncs the WAL at most once per `interval` seconds (Redis AOF "everysec")
+    and compacts it into order_data.json (mkstemp + fsync + os.replace) once it
+    grows past WAL_COMPACT_BYTES, and again at exit. Startup loads the snapshot
+    and replays the WAL, so a crash loses at most the last interval.
+
+    Orders are held as serialized bytes so every read hands out fresh dicts,
+    exactly like re-reading the file did. A status -> order ids index is kept
+    alongside them for ids_by_status().
+
+    The cache is per process: only use this with a single gunicorn worker
+    (threads are fine; they share it under one lock).
+    """
+
+    WAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, path: str, interval: float):
+        super().__init__(path)
+        self.interval = interval
+        self.wal_path = path + ".log"
+        # RLock: an update() callback that reads the store again can't deadlock itself.
+        self._mu = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._orders: Dict[str, bytes] = {}
+        self._by_status: Dict[str, set] = {}
+        self._status_of: Dict[str, str] = {}
+        self._dirty = threading.Event()
+
+        lf = self._lock()
+        try:
+            snapshot = super()._read_unlocked() or {}
+        finally:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+            lf.close()
+        self._orders = {str(oid): json_bytes(o) for oid, o in snapshot.items() if isinstance(o, dict)}
+        replayed = self._replay_wal()
+        for oid, raw in self._orders.items():
+            self._index_unlocked(oid, json_parse(raw).get("status"))
+
+        self._wal = open(self.wal_path, "ab")
+        self._wal_bytes = self._wal.tell()
+        if replayed:
+            log.info("♻️ Replayed %s order change(s) from %s", replayed, self.wal_path)
+        if self._wal_bytes:
+            # Fold the WAL (and any torn tail) into the snapshot before appending again.
+            self.compact()
+
+        threading.Thread(target=self._flusher, name="order-flush", daemon=True).start()
+
+    def _replay_wal(self) -> int:
+        if not os.path.exists(self.wal_path):
+            return 0
+        n = 0
+        with open(self.wal_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json_parse(line)
+                    self._orders[str(entry["order_id"])] = json_bytes(entry["order"])
+                    n += 1
+                except Exception:
+                    # A torn last line from a crash mid-append; everything before it is intact.
+                    log.warning("⚠️ Stopped WAL replay at a bad line in %s", self.wal_path)
+                    break
+        return n
+
+    def _index_unlocked(self, order_id: str, status: Any) -> None:
+        status = str(status or "")
+        old = self._status_of.get(order_id)
+        if old == status:
+            return
+        if old is not None:
+            ids = self._by_status.get(old)
+            if ids is not None:
+                ids.discard(order_id)
+                if not ids:
+                    del self._by_status[old]
+        self._status_of[order_id] = status
+        self._by_status.setdefault(status, set()).add(order_id)
+
+    def _append_unlocked(self, order_id: str, raw: bytes) -> None:
+        line = b'{"order_id":' + json_bytes(order_id) + b',"order":' + raw + b"}\n"
+        self._wal.write(line)
+        self._wal.flush()
+        self._wal_bytes += len(line)
+        self._dirty.set()
+
+    def compact(self) -> None:
+        """
+        Write the full snapshot to order_data.json and drop the WAL lines it covers.
+
+        Only the snapshot (a list of references) is taken under the store lock;
+        the join + fsync + rename run outside it so webhooks keep writing.
+        """
+        with self._compact_lock:
+            with self._mu:
+                items = list(self._orders.items())
+                wal_mark = self._wal_bytes
+
+            raw = b"{" + b",".join(json_bytes(oid) + b":" + o for oid, o in items) + b"}"
+            lf = self._lock()
+            try:
+                self._replace_file(raw)
+            finally:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+                lf.close()
+
+            with self._mu:
+                # Lines appended while the snapshot was written aren't in it; keep them.
+                tail = b""
+                if self._wal_bytes > wal_mark:
+                    self._wal.flush()
+                    with open(self.wal_path, "rb") as f:
+                        f.seek(wal_mark)
+                        tail = f.read()
+                self._wal.truncate(0)
+                if tail:
+                    self._wal.write(tail)
+                self._wal.flush()
+                os.fsync(self._wal.fileno())
+                self._wal_bytes = len(tail)
+
+    def flush(self) -> None:
+        """fsync pending WAL lines; compact once the WAL is large."""
+        self._dirty.clear()
+        if self._wal_bytes >= self.WAL_COMPACT_BYTES:
+            self.compact()
+            return
+        with self._mu:
+            os.fsync(self._wal.fileno())
+
+    def _flusher(self) -> None:
+        while True:
+            self._dirty.wait()
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("❌ order WAL flush failed: %s", e)
+                self._dirty.set()
+
+    def count(self) -> int:
+        with self._mu:
+            return len(self._orders)
+
+    def all_orders(self) -> Dict[str, Dict[str, Any]]:
+        with self._mu:
+            items = list(self._orders.items())
+        return {oid: json_parse(raw) for oid, raw in items}
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        with self._mu:
+            raw = self._orders.get(order_id)
+        return json_parse(raw) if raw else None
+
+    def upsert(self, order_id: str, order_obj: Dict[str, Any]) -> None:
+        with self._mu:
+            order_obj["updated_at"] = utc_iso()
+            raw = json_bytes(order_obj)
+            self._orders[order_id] = raw
+            self._index_unlocked(order_id, order_obj.get("status"))
+            self._append_unlocked(order_id, raw)
+
+    def update(self, order_id: str, fn) -> Tuple[Dict[str, Any], bool]:
+        with self._mu:
+            raw = self._orders.get(order_id)
+            order = json_parse(raw) if raw else {
+                "items": [], "shipping": {}, "status": "created", "created_at": utc_iso()
+            }
+
+            new_order, changed = fn(order)
+            if changed:
+                new_order["updated_at"] = utc_iso()
+                raw = json_bytes(new_order)
+                self._orders[order_id] = raw
+                self._index_unlocked(order_id, new_order.get("status"))
+                self._append_unlocked(order_id, raw)
+            return new_order, changed
+
+    def ids_by_status(self, status: str) -> List[str]:
+        with self._mu:
+            return list(self._by_status.get(status, ()))
+
+    def find_by_slant_public_order_id(self, public_id: str) -> Optional[str]:
+        public_id = (public_id or "").strip()
+        if not public_id:
+            return None
+
+        for oid, obj in self.all_orders().items():
+            sl = obj.get("slant") or {}
+            if str(sl.get("publicOrderId") or "").strip() == public_id:
+                return oid
+
+            ful = obj.get("fulfillment") or {}
+            if str(ful.get("slant_public_id") or "").strip() == public_id:
+                return oid
+
+        return None
+
+
+class SqliteOrderStore:
+    """
+    Same interface as OrderStore, backed by SQLite with one row per order.
+
+    Table:
+      orders(order_id TEXT PRIMARY KEY, doc TEXT, status TEXT, updated_at TEXT)
+        doc is the order as JSON; status / updated_at are copied out of it on
+        every write so status scans use an index instead of parsing docs.
+
+    WAL journal + synchronous=NORMAL: readers never block the writer and a
+    commit costs one WAL append, so an update is one small row write instead
+    of rewriting every order. update() runs its read-modify-write inside
+    BEGIN IMMEDIATE, which also serializes it against other gunicorn workers.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One connection shared by all threads; sqlite3 objects aren't safe for
+        # concurrent use, so every statement runs under _mu.
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._mu = threading.RLock()
+        with self._mu:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS orders ("
+                "order_id TEXT PRIMARY KEY, doc TEXT NOT NULL, status TEXT, updated_at TEXT)"
+            )
+            # Databases created before status/updated_at existed: add and backfill them.
+            cols = {row[1] for row in self._db.execute("PRAGMA table_info(orders)")}
+            if "status" not in cols or "updated_at" not in cols:
+                for col in ("status", "updated_at"):
+                    if col not in cols:
+                        self._db.execute(f"ALTER TABLE orders ADD COLUMN {col} TEXT")
+                self._db.execute(
+                    "UPDATE orders SET status = json_extract(doc, '$.status'), "
+                    "updated_at = json_extract(doc, '$.updated_at')"
+                )
+            self._db.execute("CREATE INDEX IF NOT EXISTS orders_status ON orders(status, updated_at)")
+            # Lookups by Slant public order id (webhooks) without scanning every doc.
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS orders_slant_public_order_id "
+                "ON orders(json_extract(doc, '$.slant.publicOrderId'))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS orders_fulfillment_slant_public_id "
+                "ON orders(json_extract(doc, '$.fulfillment.slant_public_id'))"
+            )
+
+    @staticmethod
+    def _encode(order: Dict[str, Any]) -> str:
+        return json_text(order)
+
+    @classmethod
+    def _row(cls, order_id: str, order: Dict[str, Any]) -> Tuple[str, str, Optional[str], Optional[str]]:
+        return order_id, cls._encode(order), order.get("status"), order.get("updated_at")
+
+    def _write(self, order_id: str, order: Dict[str, Any]) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO orders (order_id, doc, status, updated_at) VALUES (?, ?, ?, ?)",
+            self._row(order_id, order),
+        )
+
+    def count(self) -> int:
+        with self._mu:
+            return int(self._db.execute("SELECT COUNT(*) FROM orders").fetchone()[0])
+
+    def all_orders(self) -> Dict[str, Dict[str, Any]]:
+        """Return a snapshot of all saved orders for recovery checks."""
+        with self._mu:
+            rows = self._db.execute("SELECT order_id, doc FROM orders").fetchall()
+        return {str(oid): json_parse(doc) for oid, doc in rows}
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        with self._mu:
+            row = self._db.execute("SELECT doc FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return json_parse(row[0]) if row else None
+
+    def upsert(self, order_id: str, order_obj: Dict[str, Any]) -> None:
+        with self._mu:
+            order_obj["updated_at"] = utc_iso()
+            self._write(order_id, order_obj)
+
+    def update(self, order_id: str, fn) -> Tuple[Dict[str, Any], bool]:
+        with self._mu:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT doc FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+                order = json_parse(row[0]) if row else {
+                    "items": [], "shipping": {}, "status": "created", "created_at": utc_iso()
+                }
+
+                new_order, changed = fn(order)
+                if changed:
+                    new_order["updated_at"] = utc_iso()
+                    self._write(order_id, new_order)
+                self._db.execute("COMMIT")
+                return new_order, changed
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def ids_by_status(self, status: str) -> List[str]:
+        with self._mu:
+            rows = self._db.execute(
+                "SELECT order_id FROM orders WHERE status = ? ORDER BY updated_at", (status,)
+            ).fetchall()
+        return [str(r[0]) for r in rows]
+
+    def find_by_slant_public_order_id(self, public_id: str) -> Optional[str]:
+        public_id = (public_id or "").strip()
+        if not public_id:
+            return None
+
+        with self._mu:
+            row = self._db.execute(
+                "SELECT order_id FROM orders WHERE json_extract(doc, '$.slant.publicOrderId') = ? "
+                "UNION ALL "
+                "SELECT order_id FROM orders WHERE json_extract(doc, '$.fulfillment.slant_public_id') = ? "
+                "LIMIT 1",
+                (public_id, public_id),
+            ).fetchone()
+        return str(row[0]) if row else None
+
+    def import_orders(self, orders: Dict[str, Dict[str, Any]]) -> int:
+        """One-shot migration from order_data.json; existing rows win."""
+        rows = [
+            self._row(str(oid), obj)
+            for oid, obj in (orders or {}).items()
+            if isinstance(obj, dict)
+        ]
+        with self._mu:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO orders (order_id, doc, status, updated_at) VALUES (?, ?, ?, ?)", rows
+                )
+                imported = self._db.total_changes - before
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return imported
+
+
+class RedisOrderStore:
+    """
+    Same interface as OrderStore, backed by Redis hashes (safe across workers).
+
+    Keys:
+      order:<order_id>                  hash, one JSON-encoded value per top-level order field
+      orders                            set of every saved order_id
+      order:slant-public:<publicId>     internal order_id for a Slant public order id
+      orders:status:<status>            set of order_ids currently in that status
+
+    update() runs inside WATCH/MULTI and only HSETs the fields whose encoded
+    value changed, so a status flip is O(1) instead of a full-file rewrite.
+    """
+
+    INDEX_KEY = "orders"
+
+    def __init__(self, client):
+        self.r = client
+
+    @staticmethod
+    def _key(order_id: str) -> str:
+        return f"order:{order_id}"
+
+    @staticmethod
+    def _slant_key(public_id: str) -> str:
+        return f"order:slant-public:{public_id}"
+
+    @staticmethod
+    def _status_key(status: str) -> str:
+        return f"orders:status:{status}"
+
+    @staticmethod
+    def _encode(order: Dict[str, Any]) -> Dict[str, str]:
+        return {str(k): json_text(v) for k, v in order.items()}
+
+    @staticmethod
+    def _decode(raw: Dict[str, str]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for k, v in (raw or {}).items():
+            try:
+                out[k] = json_parse(v)
+            except Exception:
+                out[k] = v
+        return out
+
+    @staticmethod
+    def _slant_public_ids(order: Dict[str, Any]) -> List[str]:
+        ids = []
+        sl = order.get("slant") or {}
+        ful = order.get("fulfillment") or {}
+        for v in (sl.get("publicOrderId"), ful.get("slant_public_id")):
+            v = str(v or "").strip()
+            if v:
+                ids.append(v)
+        return ids
+
+    def _queue_write(
+        self, pipe, order_id: str, before: Dict[str, str], order: Dict[str, Any], old_status: Optional[str] = None
+    ) -> None:
+        encoded = self._encode(order)
+        changed = {k: v for k, v in encoded.items() if before.get(k) != v}
+        removed = [k for k in before if k not in encoded]
+        key = self._key(order_id)
+        if changed:
+            pipe.hset(key, mapping=changed)
+        if removed:
+            pipe.hdel(key, *removed)
+        pipe.sadd(self.INDEX_KEY, order_id)
+        new_status = str(order.get("status") or "")
+        if old_status and old_status != new_status:
+            pipe.srem(self._status_key(old_status), order_id)
+        pipe.sadd(self._status_key(new_status), order_id)
+        for public_id in self._slant_public_ids(order):
+            pipe.set(self._slant_key(public_id), order_id)
+
+    def count(self) -> int:
+        return int(self.r.scard(self.INDEX_KEY) or 0)
+
+    def all_orders(self) -> Dict[str, Dict[str, Any]]:
+        """Return a snapshot of all saved orders for recovery checks."""
+        order_ids = sorted(self.r.smembers(self.INDEX_KEY) or [])
+        if not order_ids:
+            return {}
+        pipe = self.r.pipeline(transaction=False)
+        for oid in order_ids:
+            pipe.hgetall(self._key(oid))
+        return {
+            str(oid): self._decode(raw)
+            for oid, raw in zip(order_ids, pipe.execute())
+            if raw
+        }
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.r.hgetall(self._key(order_id))
+        return self._decode(raw) if raw else None
+
+    def upsert(self, order_id: str, order_obj: Dict[str, Any]) -> None:
+        key = self._key(order_id)
+        prev = self.r.hget(key, "status")
+        old_status = str(self._decode({"status": prev})["status"] or "") if prev else None
+        pipe = self.r.pipeline(transaction=True)
+        pipe.delete(key)
+        order_obj["updated_at"] = utc_iso()
+        self._queue_write(pipe, order_id, {}, order_obj, old_status=old_status)
+        pipe.execute()
+
+    def update(self, order_id: str, fn) -> Tuple[Dict[str, Any], bool]:
+        key = self._key(order_id)
+        with self.r.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    before = pipe.hgetall(key) or {}
+                    order = self._decode(before) if before else {
+                        "items": [], "shipping": {}, "status": "created", "created_at": utc_iso()
+                    }
+
+                    new_order, changed = fn(dict(order))
+                    if not changed:
+                        pipe.unwatch()
+                        return new_order, changed
+
+                    new_order["updated_at"] = utc_iso()
+                    old_status = str(order.get("status") or "") if before else None
+                    pipe.multi()
+                    self._queue_write(pipe, order_id, before, new_order, old_status=old_status)
+                    pipe.execute()
+                    return new_order, changed
+                except redis.WatchError:
+                    # Another worker changed this order between read and write; re-run fn.
+                    continue
+
+    def find_by_slant_public_order_id(self, public_id: str) -> Optional[str]:
+        public_id = (public_id or "").strip()
+        if not public_id:
+            return None
+
+        oid = self.r.get(self._slant_key(public_id))
+        if oid:
+            return str(oid)
+
+        # Slow path for orders saved before the index key existed.
+        for oid, obj in self.all_orders().items():
+            if public_id in self._slant_public_ids(obj):
+                self.r.set(self._slant_key(public_id), oid)
+                return oid
+        return None
+
+    def ids_by_status(self, status: str) -> List[str]:
+        """
+        Members of orders:status:<status>, re-checked against each order's
+        status field (O(k)) so an entry left by an interrupted write is dropped.
+        Orders last written before the index existed appear after their next write.
+        """
+        key = self._status_key(status)
+        order_ids = sorted(self.r.smembers(key) or [])
+        if not order_ids:
+            return []
+        pipe = self.r.pipeline(transaction=False)
+        for oid in order_ids:
+            pipe.hget(self._key(oid), "status")
+        out = []
+        for oid, raw in zip(order_ids, pipe.execute()):
+            current = str(self._decode({"status": raw})["status"] or "") if raw is not None else None
+            if current == status:
+                out.append(str(oid))
+            else:
+                self.r.srem(key, oid)
+        return out
+
+    def import_orders(self, orders: Dict[str, Dict[str, Any]]) -> int:
+        """One-shot migration from order_data.json; existing Redis orders win."""
+        imported = 0
+        for oid, obj in (orders or {}).items():
+            if not isinstance(obj, dict) or self.r.exists(self._key(oid)):
+                continue
+            self.upsert(str(oid), obj)
+            imported += 1
+        return imported
+
+
 class DailyQuotaStore:
     """
     Tracks a per-day cap using a JSON file + fcntl lock (safe across gunicorn workers).
@@ -484,20 +1351,21 @@ class DailyQuotaStore:
     def _read_unlocked(self) -> Dict[str, Any]:
         if not os.path.exists(self.path):
             return {}
-        with open(self.path, "r") as f:
+        with open(self.path, "rb") as f:
             raw = f.read().strip()
-            return json.loads(raw) if raw else {}
+            return json_parse(raw) if raw else {}
 
     def _write_unlocked(self, data: Dict[str, Any]) -> None:
         dirpath = os.path.dirname(self.path)
         os.makedirs(dirpath, exist_ok=True)
         fd, tmp_path = tempfile.mkstemp(prefix="quota_", suffix=".json", dir=dirpath)
         try:
-            with os.fdopen(fd, "w") as tmp:
-                json.dump(data, tmp)
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(json_bytes(data))
                 tmp.flush()
                 os.fsync(tmp.fileno())
             os.replace(tmp_path, self.path)
+            fsync_dir(dirpath)
         finally:
             try:
                 if os.path.exists(tmp_path):
@@ -507,11 +1375,11 @@ class DailyQuotaStore:
 
     def _now_local(self) -> datetime:
         if ZoneInfo is None:
-            return datetime.utcnow()
+            return utc_now()
         try:
             return datetime.now(ZoneInfo(self.tz_name))
         except Exception:
-            return datetime.utcnow()
+            return utc_now()
 
     def day_key(self) -> str:
         # Local day key (defaults to UTC if ZoneInfo missing/bad tz)
@@ -773,9 +1641,59 @@ class DailyQuotaStore:
             fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
             lf.close()
 
+def _flush_on_sigterm(flush) -> None:
+    """
+    Run `flush` when SIGTERM arrives (Render deploys/restarts), then hand the
+    signal to whatever handler was installed before (gunicorn's graceful exit).
+    """
+    prev = signal.getsignal(signal.SIGTERM)
+
+    def _handler(signum, frame):
+        # Flush from a helper thread: the main thread may be interrupted while
+        # holding the store lock, and joining with a timeout can't deadlock.
+        t = threading.Thread(target=flush, name="sigterm-flush", daemon=True)
+        t.start()
+        t.join(10)
+        if callable(prev):
+            prev(signum, frame)
+        elif prev != signal.SIG_IGN:
+            raise SystemExit(128 + signum)
+
+    try:
+        signal.signal(signal.SIGTERM, _handler)
+    except ValueError:
+        pass  # not the main thread (e.g. imported by a test runner); atexit still flushes
+
+
+def _build_order_store():
+    if CFG.order_store_backend == "sqlite":
+        store = SqliteOrderStore(CFG.order_sqlite_path)
+        if os.path.exists(CFG.order_data_path) and store.count() == 0:
+            imported = store.import_orders(OrderStore(CFG.order_data_path).all_orders())
+            log.info("♻️ Imported %s order(s) from %s into %s", imported, CFG.order_data_path, CFG.order_sqlite_path)
+        return store
+
+    if CFG.order_store_backend != "redis":
+        if CFG.order_flush_interval_sec > 0:
+            store = BufferedOrderStore(CFG.order_data_path, CFG.order_flush_interval_sec)
+            atexit.register(store.compact)
+            _flush_on_sigterm(store.compact)
+            return store
+        return OrderStore(CFG.order_data_path)
+
+    if redis is None:
+        raise RuntimeError("ORDER_STORE_BACKEND=redis but the redis package is not installed")
+
+    store = RedisOrderStore(REDIS)
+    if os.path.exists(CFG.order_data_path) and store.count() == 0:
+        imported = store.import_orders(OrderStore(CFG.order_data_path).all_orders())
+        log.info("♻️ Imported %s order(s) from %s into Redis", imported, CFG.order_data_path)
+    return store
 
 
-STORE = OrderStore(CFG.order_data_path)
+REDIS = redis.Redis.from_url(CFG.redis_url, decode_responses=True) if (redis is not None and CFG.redis_url) else None
+
+STORE = _build_order_store()
 
 QUOTA = DailyQuotaStore(
     path=CFG.quota_data_path,
@@ -816,32 +1734,278 @@ def slant_headers(extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
     return h
 
 
+# Slant API session: Accept/Authorization set once instead of per call. Its adapter
+# never retries: slant_request() is the only retry layer for Slant, so every attempt
+# goes through the rate limiter and circuit breaker and Retry-After stays capped.
+# The presigned S3 PUT deliberately uses S3_UPLOAD instead.
+SLANT = requests.Session()
+SLANT.headers.update({"User-Agent": APP_VERSION, **slant_headers()})
+_SLANT_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+SLANT.mount("https://", _SLANT_ADAPTER)
+SLANT.mount("http://", _SLANT_ADAPTER)
+
+
 def slant_timeout() -> Tuple[int, int]:
-    return (10, CFG.slant_timeout_sec)
+    return (CFG.slant_connect_timeout_sec, CFG.slant_timeout_sec)
+
+
+class SlantRateLimiter:
+    """
+    Client-side rate limit for outbound Slant API calls so a burst of paid
+    orders doesn't trip Slant's 429s.
+
+    Uses a per-second INCR counter in Redis when configured (shared across
+    workers), otherwise an in-process token bucket. rate <= 0 disables it.
+    """
+
+    def __init__(self, rate_per_sec: float):
+        self.rate = float(rate_per_sec or 0)
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _acquire_redis(self) -> bool:
+        limit = max(1, int(self.rate))
+        while True:
+            now = time.time()
+            key = f"slant:rps:{int(now)}"
+            try:
+                pipe = REDIS.pipeline(transaction=True)
+                pipe.incr(key)
+                pipe.expire(key, 2)
+                count = int(pipe.execute()[0])
+            except Exception:
+                return False
+            if count <= limit:
+                return True
+            time.sleep(max(0.01, 1.0 - (now % 1.0)))
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        if REDIS is not None and self._acquire_redis():
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+SLANT_RATE_LIMITER = SlantRateLimiter(CFG.slant_max_rps)
+
+
+class SlantCircuitBreaker:
+    """
+    Stop calling Slant for `reset_sec` after `fail_max` consecutive failures
+    (connection errors, timeouts, 5xx), so an outage fails each submission
+    fast into retry_wait instead of parking a thread on every connect.
+
+    After the pause one trial request goes through (half-open); its result
+    closes the breaker or re-opens it, so every before() that returns must be
+    followed by a record(). 4xx/429 count as success: Slant is up.
+    fail_max <= 0 disables it.
+    """
+
+    def __init__(self, fail_max: int, reset_sec: float):
+        self.fail_max = fail_max
+        self.reset_sec = reset_sec
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def before(self, where: str) -> None:
+        if self.fail_max <= 0:
+            return
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if not self.trial and time.monotonic() - self.opened_at >= self.reset_sec:
+                self.trial = True
+                return
+        # 503 keeps it in SLANT_RETRYABLE_HTTP_STATUSES, so the order goes to retry_wait.
+        raise SlantError(503, "circuit open: Slant is failing, not calling it", where)
+
+    def record(self, ok: bool) -> None:
+        if self.fail_max <= 0:
+            return
+        with self.lock:
+            self.trial = False
+            if ok:
+                if self.opened_at is not None:
+                    log.info("✅ Slant circuit closed")
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.fail_max:
+                if self.opened_at is None:
+                    log.error("🚨 Slant circuit open after %s consecutive failures", self.failures)
+                self.opened_at = time.monotonic()
+
+
+SLANT_BREAKER = SlantCircuitBreaker(CFG.slant_breaker_failures, CFG.slant_breaker_reset_sec)
+SLANT_MAX_RETRY_AFTER_SEC = 30
+# Slant JSON replies are small; a 502 HTML page or runaway body is cut here
+# instead of being pulled into memory on every retry.
+SLANT_MAX_RESPONSE_BYTES = 2 * 1024 * 1024
+# Largest Slant reply kept on the order itself (order_data.json is rewritten per change).
+SLANT_STORED_RESPONSE_BYTES = 2048
+
+
+_SLANT_IDEMPOTENT_RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def _retry_after_seconds(value: Optional[str], default: float = 1.0) -> float:
+    value = (value or "").strip()
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except Exception:
+            return default
+    return min(max(0.0, seconds), SLANT_MAX_RETRY_AFTER_SEC)
+
+
+def slant_request(method: str, url: str, idempotent: bool = False, **kwargs) -> requests.Response:
+    """
+    Send one Slant API request through the rate limiter.
+
+    A 429 means Slant rejected the request without acting on it, so it is
+    safe to wait Retry-After and send it once more, even for POSTs.
+    Read-only calls pass idempotent=True so a 502/503/504 or a failed connect
+    gets that one extra attempt too. State-changing POSTs never do: a gateway
+    error may come after Slant acted, so those go back through retry_wait.
+    """
+    retry_statuses = _SLANT_IDEMPOTENT_RETRY_STATUSES if idempotent else (429,)
+    r = None
+    for attempt in range(2):
+        SLANT_BREAKER.before(f"Slant {method} {url}")
+        SLANT_RATE_LIMITER.acquire()
+        try:
+            r = SLANT.request(method, url, stream=True, **kwargs)
+            _read_bounded(r, SLANT_MAX_RESPONSE_BYTES)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            SLANT_BREAKER.record(False)
+            # A read timeout may mean Slant is still working on it; only retry a failed
+            # connect or a reply cut off mid-body.
+            if not idempotent or attempt or isinstance(e, requests.ReadTimeout):
+                raise
+            log.warning("⏳ Slant connection error on %s %s; retrying in 1.0s: %s", method, url, e)
+            time.sleep(1.0)
+            continue
+        except Exception:
+            # Any other failure still has to be recorded: it may be the half-open
+            # trial, and an unrecorded trial would hold the breaker open for good.
+            SLANT_BREAKER.record(False)
+            raise
+        SLANT_BREAKER.record(r.status_code < 500)
+        if r.status_code not in retry_statuses or attempt:
+            return r
+        delay = _retry_after_seconds(r.headers.get("Retry-After"))
+        log.warning("⏳ Slant %s on %s %s; retrying in %.1fs", r.status_code, method, url, delay)
+        time.sleep(delay)
+    return r
+
+
+def _read_bounded(r: requests.Response, limit: int) -> None:
+    """
+    Load at most `limit` bytes of a stream=True body so r.text / r.json() work as usual.
+    Goes through iter_content (not r.raw) so a truncated or stalled body surfaces as
+    requests' ChunkedEncodingError / ConnectionError, like a normal read would.
+    """
+    chunks: List[bytes] = []
+    size = 0
+    try:
+        for chunk in r.iter_content(64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > limit:
+                break
+    finally:
+        r.close()
+    body = b"".join(chunks)
+    if len(body) > limit:
+        log.warning("⚠️ Slant response from %s exceeded %s bytes; truncated", r.url, limit)
+        body = body[:limit]
+    r._content = body
+    r._content_consumed = True
+
+
+def bounded_for_store(obj: Any, limit: int = SLANT_STORED_RESPONSE_BYTES) -> Any:
+    """Return obj unchanged if it serializes within `limit` bytes, else a truncated preview."""
+    try:
+        raw = json_bytes(obj)
+    except Exception:
+        raw = str(obj).encode("utf-8", "replace")
+    if len(raw) <= limit:
+        return obj
+    return {"_truncated": True, "_bytes": len(raw), "preview": raw[:limit].decode("utf-8", "ignore")}
 
 
 def _safe_json(r: requests.Response) -> Dict[str, Any]:
+    raw = r.content or b""
     try:
-        return r.json() if (r.text or "").strip() else {}
+        return json_parse(raw) if raw.strip() else {}
     except Exception:
         return {"_raw": (r.text or "")[:4000]}
 
 
 def _slant_log(where: str, obj: Dict[str, Any]) -> None:
-    if CFG.slant_debug:
-        print(f"🧪 {where} {json.dumps(obj, ensure_ascii=False, default=str)[:4000]}")
+    if not CFG.slant_debug or not log.isEnabledFor(logging.INFO):
+        return
+    text = json_text(obj)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("🧪 %s %s", where, text)
+    else:
+        log.info("🧪 %s (%d bytes) %s", where, len(text), text[:LOG_PREVIEW_BYTES])
+
+
+# Where Slant has been seen to put ids, most specific shape first.
+_PFSID_PATHS = (
+    ("data", "publicFileServiceId"),
+    ("data", "publicId"),
+    ("data", "id"),
+    ("publicFileServiceId",),
+    ("publicId",),
+    ("id",),
+)
+_ORDER_ID_PATHS = tuple(
+    prefix + (key,)
+    for prefix in (("data", "order"), ("data",), ())
+    for key in ("publicId", "publicOrderId", "id")
+)
+
+
+def _extract(payload: Any, paths: Tuple[Tuple[str, ...], ...]) -> Any:
+    """Return the first truthy value found along `paths` in nested dicts, else None."""
+    for path in paths:
+        cur = payload
+        for k in path:
+            if not isinstance(cur, dict):
+                cur = None
+                break
+            cur = cur.get(k)
+        if cur:
+            return cur
+    return None
 
 
 def parse_slant_file_public_id(payload: dict) -> str:
-    data_obj = payload.get("data") if isinstance(payload, dict) else None
-    candidates = []
-    if isinstance(data_obj, dict):
-        candidates += [data_obj.get("publicFileServiceId"), data_obj.get("publicId"), data_obj.get("id")]
-    if isinstance(payload, dict):
-        candidates += [payload.get("publicFileServiceId"), payload.get("publicId"), payload.get("id")]
-    for c in candidates:
-        if c:
-            return str(c)
+    file_id = _extract(payload, _PFSID_PATHS)
+    if file_id:
+        return str(file_id)
     raise RuntimeError(f"Slant response missing file id: {str(payload)[:1200]}")
 
 
@@ -865,8 +2029,18 @@ def stl_probe_head(url: str) -> Dict[str, Any]:
 # ----------------------------
 # Slant filaments (cache + robust parsing)
 # ----------------------------
-_FILAMENT_CACHE: Dict[str, Any] = {"ts": 0.0, "data": None}
 _FILAMENT_CACHE_TTL_SEC: int = safe_int(env_str("SLANT_FILAMENTS_CACHE_TTL_SEC", "600"), 600)
+# "ttl" is re-drawn (±10%) on every refresh; "refreshing" marks a background refresh in flight.
+# "index" / "resolved" are rebuilt with "data" (see _build_filament_index / resolve_filament_id).
+_FILAMENT_CACHE: Dict[str, Any] = {
+    "ts": 0.0,
+    "data": None,
+    "ttl": float(_FILAMENT_CACHE_TTL_SEC),
+    "refreshing": False,
+    "index": [],
+    "resolved": {},
+}
+_FILAMENT_LOCK = threading.Lock()
 
 
 def _extract_list_from_slant_payload(payload: Any) -> List[Dict[str, Any]]:
@@ -928,9 +2102,10 @@ def slant_get_filaments() -> List[Dict[str, Any]]:
     if not endpoint:
         endpoint = f"{CFG.slant_base_url.rstrip('/')}/filaments"
 
-    r = HTTP.get(
+    r = slant_request(
+        "GET",
         endpoint,
-        headers=slant_headers({"Content-Type": "application/json"}),
+        idempotent=True,
         timeout=slant_timeout(),
     )
 
@@ -954,27 +2129,74 @@ def slant_get_filaments() -> List[Dict[str, Any]]:
     return items
 
 
-def slant_get_filaments_cached(force: bool = False) -> List[Dict[str, Any]]:
-    now = time.time()
-    if (
-        not force
-        and _FILAMENT_CACHE["data"] is not None
-        and (now - float(_FILAMENT_CACHE["ts"] or 0.0)) < _FILAMENT_CACHE_TTL_SEC
-    ):
-        return _FILAMENT_CACHE["data"]
+def _build_filament_index(filaments: List[Dict[str, Any]]) -> List[Tuple[str, str, str]]:
+    """(profile, color, id) for every available filament with an id, normalized once per refresh."""
+    index = []
+    for f in filaments:
+        if not _filament_available(f):
+            continue
+        fid = _extract_filament_id(f)
+        if fid:
+            index.append((_filament_profile(f).strip().lower(), _filament_color(f).strip().lower(), fid))
+    return index
 
+
+def _refresh_filaments() -> List[Dict[str, Any]]:
     data = slant_get_filaments()
-    _FILAMENT_CACHE["ts"] = now
-    _FILAMENT_CACHE["data"] = data
+    index = _build_filament_index(data)
+    with _FILAMENT_LOCK:
+        _FILAMENT_CACHE["ts"] = time.time()
+        _FILAMENT_CACHE["data"] = data
+        _FILAMENT_CACHE["index"] = index
+        _FILAMENT_CACHE["resolved"] = {}
+        _FILAMENT_CACHE["ttl"] = _FILAMENT_CACHE_TTL_SEC * random.uniform(0.9, 1.1)
+        _FILAMENT_CACHE["refreshing"] = False
     return data
 
 
+def _refresh_filaments_in_background() -> None:
+    try:
+        _refresh_filaments()
+    except Exception as e:
+        # Keep serving the stale list; the next read past the TTL tries again.
+        log.warning("⚠️ Background filaments refresh failed: %s", e)
+        with _FILAMENT_LOCK:
+            _FILAMENT_CACHE["refreshing"] = False
+
+
+def slant_get_filaments_cached(force: bool = False) -> List[Dict[str, Any]]:
+    """
+    Filaments list with stale-while-revalidate: fresh for ~TTL, then served
+    stale for up to another TTL while one background thread refreshes it.
+    Only a cold cache (or one older than 2x TTL) blocks on Slant.
+    """
+    if not force:
+        with _FILAMENT_LOCK:
+            data = _FILAMENT_CACHE["data"]
+            age = time.time() - float(_FILAMENT_CACHE["ts"] or 0.0)
+            ttl = float(_FILAMENT_CACHE["ttl"])
+            if data is not None and age < 2 * ttl:
+                if age >= ttl and not _FILAMENT_CACHE["refreshing"]:
+                    _FILAMENT_CACHE["refreshing"] = True
+                    threading.Thread(
+                        target=_refresh_filaments_in_background, name="filaments-refresh", daemon=True
+                    ).start()
+                return data
+
+    return _refresh_filaments()
+
+
 # ----------------------------
 # Slant files upload (presigned direct upload)
 # ----------------------------
+# Fixed for the life of the process; built once instead of per upload.
+SLANT_FILES_URL = (CFG.slant_files_endpoint or f"{CFG.slant_base_url.rstrip('/')}/files").rstrip("/")
+SLANT_DIRECT_UPLOAD_URL = f"{SLANT_FILES_URL}/direct-upload"
+SLANT_CONFIRM_UPLOAD_URL = f"{SLANT_FILES_URL}/confirm-upload"
+
+
 def _slant_file_endpoint(suffix: str = "") -> str:
-    base = (CFG.slant_files_endpoint or f"{CFG.slant_base_url.rstrip('/')}/files").rstrip("/")
-    return f"{base}/{suffix.lstrip('/')}" if suffix else base
+    return f"{SLANT_FILES_URL}/{suffix.lstrip('/')}" if suffix else SLANT_FILES_URL
 
 
 def _slant_get_file_record(public_file_service_id: str) -> Optional[Dict[str, Any]]:
@@ -988,28 +2210,29 @@ def _slant_get_file_record(public_file_service_id: str) -> Optional[Dict[str, An
 
     endpoint = _slant_file_endpoint(public_file_service_id)
     try:
-        r = HTTP.get(
+        r = slant_request(
+            "GET",
             endpoint,
-            headers=slant_headers({"Content-Type": "application/json"}),
+            idempotent=True,
             timeout=slant_timeout(),
         )
     except Exception as exc:
-        print(
-            f"⚠️ Slant file verification request failed: "
-            f"publicFileServiceId={public_file_service_id} error={exc}"
+        log.warning(
+            "⚠️ Slant file verification request failed: publicFileServiceId=%s error=%s",
+            public_file_service_id,
+            exc,
         )
         return None
 
-    print(
-        "🧪 SLANT_HTTP",
-        json.dumps(
+    log.info(
+        "🧪 SLANT_HTTP %s",
+        json_text(
             {
                 "where": "GET /files/{publicFileServiceId}",
                 "status": r.status_code,
                 "publicFileServiceId": public_file_service_id,
                 "body_snippet": (r.text or "")[:800] if r.status_code >= 400 else "",
-            },
-            ensure_ascii=False,
+            }
         ),
     )
 
@@ -1057,25 +2280,24 @@ def slant_upload_stl(job_id: str, owner_id: str = "") -> str:
         "ownerId": owner_value,
     }
 
-    direct_endpoint = _slant_file_endpoint("direct-upload")
-    confirm_endpoint = _slant_file_endpoint("confirm-upload")
+    direct_endpoint = SLANT_DIRECT_UPLOAD_URL
+    confirm_endpoint = SLANT_CONFIRM_UPLOAD_URL
 
-    print(
-        "➡️ Slant direct upload slot request",
-        json.dumps(
+    log.info(
+        "➡️ Slant direct upload slot request %s",
+        json_text(
             {
                 "job_id": job_id,
                 "ownerId": owner_value,
                 "size_bytes": size_bytes,
                 "endpoint": direct_endpoint,
-            },
-            ensure_ascii=False,
+            }
         ),
     )
 
-    r = HTTP.post(
+    r = slant_request(
+        "POST",
         direct_endpoint,
-        headers=slant_headers({"Content-Type": "application/json"}),
         json=request_payload,
         timeout=slant_timeout(),
     )
@@ -1110,31 +2332,29 @@ def slant_upload_stl(job_id: str, owner_id: str = "") -> str:
             f"Slant filePlaceholder missing publicFileServiceId: {str(placeholder)[:1200]}"
         )
 
-    print(
-        f"✅ Slant upload slot created: job_id={job_id} "
-        f"publicFileServiceId={placeholder_file_id}"
-    )
+    log.info("✅ Slant upload slot created: job_id=%s publicFileServiceId=%s", job_id, placeholder_file_id)
 
     # Never send Slant auth headers to the presigned S3 URL.
+    # The file object is streamed from disk rather than read into memory; requests
+    # sizes a real file from its fd, so S3 still gets a Content-Length.
     with open(local_path, "rb") as stl_file:
-        put_resp = requests.put(
+        put_resp = S3_UPLOAD.put(
             presigned_url,
             data=stl_file,
             headers={"Content-Type": "application/octet-stream"},
             timeout=(15, max(CFG.slant_timeout_sec, 600)),
         )
 
-    print(
-        "🧪 SLANT_S3_HTTP",
-        json.dumps(
+    log.info(
+        "🧪 SLANT_S3_HTTP %s",
+        json_text(
             {
                 "where": "PUT presigned STL",
                 "status": put_resp.status_code,
                 "job_id": job_id,
                 "publicFileServiceId": placeholder_file_id,
                 "body_snippet": (put_resp.text or "")[:800],
-            },
-            ensure_ascii=False,
+            }
         ),
     )
 
@@ -1149,25 +2369,26 @@ def slant_upload_stl(job_id: str, owner_id: str = "") -> str:
     confirm_payload = {"filePlaceholder": placeholder}
 
     try:
-        confirm_resp = HTTP.post(
+        confirm_resp = slant_request(
+            "POST",
             confirm_endpoint,
-            headers=slant_headers({"Content-Type": "application/json"}),
             json=confirm_payload,
-            timeout=(10, max(CFG.slant_timeout_sec, 300)),
+            timeout=(CFG.slant_connect_timeout_sec, max(CFG.slant_timeout_sec, 300)),
         )
-    except (requests.Timeout, requests.ConnectionError) as exc:
+    except (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as exc:
         recovered = _slant_get_file_record(placeholder_file_id)
         if recovered is not None:
-            print(
-                f"✅ Slant confirmation recovered after network error: "
-                f"job_id={job_id} publicFileServiceId={placeholder_file_id}"
+            log.info(
+                "✅ Slant confirmation recovered after network error: job_id=%s publicFileServiceId=%s",
+                job_id,
+                placeholder_file_id,
             )
             return placeholder_file_id
         raise exc
 
-    print(
-        "🧪 SLANT_HTTP",
-        json.dumps(
+    log.info(
+        "🧪 SLANT_HTTP %s",
+        json_text(
             {
                 "where": "POST /files/confirm-upload",
                 "status": confirm_resp.status_code,
@@ -1176,8 +2397,7 @@ def slant_upload_stl(job_id: str, owner_id: str = "") -> str:
                 "body_snippet": (confirm_resp.text or "")[:1200]
                 if confirm_resp.status_code >= 400
                 else "",
-            },
-            ensure_ascii=False,
+            }
         ),
     )
 
@@ -1187,9 +2407,10 @@ def slant_upload_stl(job_id: str, owner_id: str = "") -> str:
         # is not retried and duplicated.
         recovered = _slant_get_file_record(placeholder_file_id)
         if recovered is not None:
-            print(
-                f"✅ Slant confirmation already completed: "
-                f"job_id={job_id} publicFileServiceId={placeholder_file_id}"
+            log.info(
+                "✅ Slant confirmation already completed: job_id=%s publicFileServiceId=%s",
+                job_id,
+                placeholder_file_id,
             )
             return placeholder_file_id
 
@@ -1208,16 +2429,34 @@ def slant_upload_stl(job_id: str, owner_id: str = "") -> str:
             f"placeholder={placeholder_file_id} confirmed={confirmed_file_id}"
         )
 
-    print(
-        f"✅ Slant direct upload confirmed: job_id={job_id} "
-        f"publicFileServiceId={confirmed_file_id}"
-    )
+    log.info("✅ Slant direct upload confirmed: job_id=%s publicFileServiceId=%s", job_id, confirmed_file_id)
     return confirmed_file_id
 
 
 # ----------------------------
 # Filament resolution
 # ----------------------------
+def _match_filament(index: List[Tuple[str, str, str]], want_profile: str, color: str) -> Optional[str]:
+    """
+    Flexible match over _build_filament_index() rows, in priority order:
+    profile + color, profile only, color only, then first available.
+    Colors match by substring ("black" matches "matte black").
+    """
+    if want_profile and color:
+        for prof, col, fid in index:
+            if want_profile in prof and color in col:
+                return fid
+    if want_profile:
+        for prof, _col, fid in index:
+            if want_profile in prof:
+                return fid
+    if color:
+        for _prof, col, fid in index:
+            if color in col:
+                return fid
+    return index[0][2] if index else None
+
+
 def resolve_filament_id(shipping_info: dict) -> str:
     """
     Picks a Slant filament id (publicId / filamentId) based on shipping info.
@@ -1275,71 +2514,75 @@ def resolve_filament_id(shipping_info: dict) -> str:
     if not filaments:
         raise RuntimeError("Slant /filaments returned empty list.")
 
-    def norm(s: Any) -> str:
-        return str(s or "").strip().lower()
-
-    def color_matches(wanted: str, actual: str) -> bool:
-        """
-        Flexible match:
-          - "black" matches "matte black"
-          - "red" matches "bright red"
-        """
-        if not wanted:
-            return True
-        if wanted == actual:
-            return True
-        if wanted in actual:
-            return True
-        return False
-
-    # Prefer profile + color
-    if want_profile and color_raw:
-        for f in filaments:
-            if not _filament_available(f):
-                continue
-            prof = norm(_filament_profile(f))
-            col = norm(_filament_color(f))
-            if want_profile.lower() in prof and color_matches(color_raw, col):
-                fid = _extract_filament_id(f)
-                if fid:
-                    return fid
-
-    # Profile only
-    if want_profile:
-        for f in filaments:
-            if not _filament_available(f):
-                continue
-            prof = norm(_filament_profile(f))
-            if want_profile.lower() in prof:
-                fid = _extract_filament_id(f)
-                if fid:
-                    return fid
-
-    # Color only
-    if color_raw:
-        for f in filaments:
-            if not _filament_available(f):
-                continue
-            col = norm(_filament_color(f))
-            if color_matches(color_raw, col):
-                fid = _extract_filament_id(f)
-                if fid:
-                    return fid
-
-    # Final fallback: any available filament
-    for f in filaments:
-        if not _filament_available(f):
-            continue
-        fid = _extract_filament_id(f)
-        if fid:
-            return fid
+    # Same answer for every item of every order until the list refreshes.
+    with _FILAMENT_LOCK:
+        index = _FILAMENT_CACHE["index"]
+        resolved = _FILAMENT_CACHE["resolved"]
+    key = (want_profile, color_raw)
+    fid = resolved.get(key)
+    if fid:
+        return fid
+    fid = _match_filament(index, want_profile.lower(), color_raw)
+    if fid:
+        resolved[key] = fid
+        return fid
 
     raise RuntimeError("No filament available (could not extract filamentId from Slant filaments).")
 
 # ----------------------------
 # Slant orders
 # ----------------------------
-def slant_draft_order(order_id: str, shipping: dict, items: list) -> str:
+# Which draft payload shape / process URL Slant last accepted. Tried first next
+# time so steady-state submissions make one call instead of probing every variant.
+# Entries expire so a wrong guess can't outlive a day (or a restart, via Redis).
+SLANT_PREFERRED_TTL_SEC = 24 * 3600
+_SLANT_PREFERRED: Dict[str, Tuple[str, float]] = {}  # kind -> (label, expires at, monotonic)
+
+
+def _slant_preferred(kind: str) -> str:
+    cached = _SLANT_PREFERRED.get(kind)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    value = ""
+    if REDIS is not None:
+        try:
+            value = REDIS.get(f"slant:preferred:{kind}") or ""
+        except Exception:
+            value = ""
+    # Redis keeps its own TTL; re-check it at most once a minute.
+    ttl = SLANT_PREFERRED_TTL_SEC if REDIS is None else 60
+    _SLANT_PREFERRED[kind] = (value, time.monotonic() + ttl)
+    return value
+
+
+def _remember_slant_preferred(kind: str, value: str) -> None:
+    cached = _SLANT_PREFERRED.get(kind)
+    if cached is not None and cached[0] == value and cached[1] > time.monotonic():
+        return
+    _SLANT_PREFERRED[kind] = (value, time.monotonic() + SLANT_PREFERRED_TTL_SEC)
+    if REDIS is not None:
+        try:
+            REDIS.set(f"slant:preferred:{kind}", value, ex=SLANT_PREFERRED_TTL_SEC)
+        except Exception:
+            pass
+
+
+def _forget_slant_preferred(kind: str) -> None:
+    _SLANT_PREFERRED[kind] = ("", time.monotonic() + SLANT_PREFERRED_TTL_SEC)
+    if REDIS is not None:
+        try:
+            REDIS.delete(f"slant:preferred:{kind}")
+        except Exception:
+            pass
+
+
+def _preferred_first(kind: str, variants: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+    preferred = _slant_preferred(kind)
+    return sorted(variants, key=lambda v: v[0] != preferred)
+
+
+def build_slant_draft_payload(order_id: str, shipping: dict, items: list) -> dict:
+    """Validate shipping, resolve the filament and build the root-platformId draft payload."""
     pid = (CFG.slant_platform_id or "").strip()
     if not pid:
         raise RuntimeError("SLANT_PLATFORM_ID is missing/blank at runtime.")
@@ -1370,21 +2613,18 @@ def slant_draft_order(order_id: str, shipping: dict, items: list) -> str:
 
     filament_id = resolve_filament_id(shipping)
 
-    slant_items = []
-    for it in items or []:
-        pfsid = it.get("publicFileServiceId")
-        if not pfsid:
-            continue
-        slant_items.append(
-            {
-                "type": "PRINT",
-                "publicFileServiceId": pfsid,
-                "filamentId": filament_id,
-                "quantity": int(it.get("quantity", 1)),
-                "name": it.get("name", "Krezz Mold"),
-                "sku": it.get("SKU") or it.get("sku") or it.get("job_id", ""),
-            }
-        )
+    slant_items = [
+        {
+            "type": "PRINT",
+            "publicFileServiceId": it["publicFileServiceId"],
+            "filamentId": filament_id,
+            "quantity": int(it.get("quantity", 1)),
+            "name": it.get("name", "Krezz Mold"),
+            "sku": it.get("SKU") or it.get("sku") or it.get("job_id", ""),
+        }
+        for it in items or []
+        if it.get("publicFileServiceId")
+    ]
 
     if not slant_items:
         raise RuntimeError("Order has no valid Slant items (publicFileServiceId missing).")
@@ -1404,38 +2644,54 @@ def slant_draft_order(order_id: str, shipping: dict, items: list) -> str:
         }
     }
 
-    payload_root = {
+    return {
         "platformId": pid,
         "customer": customer_details,
         "items": slant_items,
         "metadata": {"internalOrderId": order_id},
     }
 
+
+def slant_payload_fingerprint(shipping: dict, items: list) -> str:
+    """Hash of everything build_slant_draft_payload() reads, to tell when a cached payload is stale."""
+    key = [
+        CFG.slant_platform_id,
+        shipping,
+        [
+            [it.get("publicFileServiceId"), it.get("quantity", 1), it.get("name"), it.get("SKU") or it.get("sku") or it.get("job_id")]
+            for it in items or []
+        ],
+    ]
+    return hashlib.blake2b(json_bytes(key), digest_size=16).hexdigest()
+
+
+def slant_draft_order(order_id: str, shipping: dict, items: list, payload: Optional[dict] = None) -> str:
+    payload_root = payload or build_slant_draft_payload(order_id, shipping, items)
     payload_customer = {
-        "customer": {**customer_details, "platformId": pid},
-        "items": slant_items,
-        "metadata": {"internalOrderId": order_id},
+        "customer": {**payload_root["customer"], "platformId": payload_root["platformId"]},
+        "items": payload_root["items"],
+        "metadata": payload_root["metadata"],
     }
 
     last_err: Optional[Exception] = None
 
-    for label, payload in (("root_platformId", payload_root), ("customer_platformId", payload_customer)):
-        r = HTTP.post(
+    variants = [("root_platformId", payload_root), ("customer_platformId", payload_customer)]
+    for label, payload in _preferred_first("draft_payload", variants):
+        r = slant_request(
+            "POST",
             CFG.slant_orders_endpoint,
-            headers=slant_headers({"Content-Type": "application/json"}),
             json=payload,
             timeout=slant_timeout(),
         )
 
-        print(
-            "🧪 SLANT_HTTP",
-            json.dumps(
+        log.info(
+            "🧪 SLANT_HTTP %s",
+            json_text(
                 {
                     "where": f"POST /orders (draft) [{label}]",
                     "status": r.status_code,
                     "body_snippet": (r.text or "")[:1400],
-                },
-                ensure_ascii=False,
+                }
             ),
         )
 
@@ -1450,89 +2706,81 @@ def slant_draft_order(order_id: str, shipping: dict, items: list) -> str:
 
         resp = _safe_json(r)
 
-        public_order_id = None
-        if isinstance(resp, dict):
-            data_obj = resp.get("data")
-            if isinstance(data_obj, dict):
-                order_obj = data_obj.get("order")
-                if isinstance(order_obj, dict):
-                    public_order_id = (
-                        order_obj.get("publicId")
-                        or order_obj.get("publicOrderId")
-                        or order_obj.get("id")
-                    )
-
-                if not public_order_id:
-                    public_order_id = (
-                        data_obj.get("publicId")
-                        or data_obj.get("publicOrderId")
-                        or data_obj.get("id")
-                    )
-
-            if not public_order_id:
-                public_order_id = (
-                    resp.get("publicId")
-                    or resp.get("publicOrderId")
-                    or resp.get("id")
-                )
-
+        public_order_id = _extract(resp, _ORDER_ID_PATHS)
         if not public_order_id:
             raise RuntimeError(f"Draft succeeded but no public order id returned: {str(resp)[:1600]}")
 
-        print(f"✅ Slant order drafted: publicOrderId={public_order_id} via {label}")
+        log.info("✅ Slant order drafted: publicOrderId=%s via %s", public_order_id, label)
+        _remember_slant_preferred("draft_payload", label)
         return str(public_order_id)
 
+    _forget_slant_preferred("draft_payload")
     raise last_err or RuntimeError("Slant draft failed for unknown reason.")
 
 
 def slant_process_order(public_order_id: str) -> dict:
-    url1 = f"{CFG.slant_orders_endpoint}/{public_order_id}/process"
-    url2 = f"{CFG.slant_orders_endpoint}/{public_order_id}"
+    variants = [
+        ("process", f"{CFG.slant_orders_endpoint}/{public_order_id}/process"),
+        ("base", f"{CFG.slant_orders_endpoint}/{public_order_id}"),
+    ]
 
-    r = HTTP.post(url1, headers=slant_headers(), timeout=slant_timeout())
-    if r.status_code == 404:
-        r = HTTP.post(url2, headers=slant_headers(), timeout=slant_timeout())
+    preferred = _slant_preferred("process_url")
+    for label, url in _preferred_first("process_url", variants):
+        r = slant_request("POST", url, timeout=slant_timeout())
+        # A cached URL that now rejects the call may simply be the wrong one:
+        # drop the preference and let the other URL have its turn.
+        if label == preferred and 400 <= r.status_code < 500 and r.status_code != 429:
+            _forget_slant_preferred("process_url")
+            continue
+        if r.status_code != 404:
+            break
 
-    print(
-        "🧪 SLANT_HTTP",
-        json.dumps(
+    log.info(
+        "🧪 SLANT_HTTP %s",
+        json_text(
             {
                 "where": "POST /orders process",
                 "status": r.status_code,
                 "body_snippet": (r.text or "")[:1400],
-            },
-            ensure_ascii=False,
+            }
         ),
     )
 
     if r.status_code >= 400:
         raise SlantError(r.status_code, r.text, "Slant process_order", headers=dict(r.headers))
 
+    _remember_slant_preferred("process_url", label)
     return _safe_json(r) if (r.text or "").strip() else {"success": True}
 
 
-# ----------------------------
-# Slant submission (async)
-# ----------------------------
-def _set_order_status(order_id: str, status: str, extra: Optional[Dict[str, Any]] = None) -> None:
-    def _fn(order: Dict[str, Any]):
-        order["status"] = status
-        order["status_at"] = utc_iso()
-        if extra:
-            order.update(extra)
-        return order, True
-
-    STORE.update(order_id, _fn)
+# ----------------------------
+# Slant submission (async)
+# ----------------------------
+def _merge_slant(order: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge `fields` into order["slant"] (created if missing) and return it."""
+    sl = order.get("slant") or {}
+    sl |= fields
+    order["slant"] = sl
+    return sl
 
 
-def _set_slant_step(order_id: str, step: str, extra: Optional[Dict[str, Any]] = None) -> None:
+def _set_slant_step(
+    order_id: str,
+    step: str,
+    extra: Optional[Dict[str, Any]] = None,
+    status: Optional[str] = None,
+    status_extra: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Record the Slant step; with `status`, set the order status in the same write."""
     def _fn(order: Dict[str, Any]):
-        sl = order.get("slant") or {}
-        sl["step"] = step
-        sl["step_at"] = utc_iso()
+        now = utc_iso()
+        sl = _merge_slant(order, {"step": step, "step_at": now})
         if extra:
-            sl.update(extra)
-        order["slant"] = sl
+            sl |= extra
+        if status:
+            order |= {"status": status, "status_at": now}
+            if status_extra:
+                order |= status_extra
         return order, True
 
     STORE.update(order_id, _fn)
@@ -1545,18 +2793,22 @@ def _set_slant_failed(
     attempts: int = 0,
 ) -> None:
     def _fn(order: Dict[str, Any]):
-        order["slant_error"] = err
-        order["slant_error_trace"] = (tb or "")[:8000]
-        order["status"] = "slant_failed"
-
-        sl = order.get("slant") or {}
-        sl["step"] = "failed"
-        sl["step_at"] = utc_iso()
-        sl["retry_count"] = attempts
-        sl["retry_exhausted"] = True
-        sl["last_error"] = err
+        order |= {
+            "slant_error": err,
+            "slant_error_trace": (tb or "")[:8000],
+            "status": "slant_failed",
+        }
+        sl = _merge_slant(
+            order,
+            {
+                "step": "failed",
+                "step_at": utc_iso(),
+                "retry_count": attempts,
+                "retry_exhausted": True,
+                "last_error": err,
+            },
+        )
         sl.pop("next_retry_at", None)
-        order["slant"] = sl
         return order, True
 
     STORE.update(order_id, _fn)
@@ -1573,15 +2825,34 @@ def missing_stls_for_items(items: List[dict]) -> List[str]:
     return missing
 
 
+# Per-order submit locks, so a queued attempt and /debug/slant/submit can't upload
+# and draft the same order at once. Entries are refcounted and dropped when idle.
+_SUBMIT_LOCKS: Dict[str, List[Any]] = {}  # order_id -> [lock, holders + waiters]
+_SUBMIT_LOCKS_GUARD = threading.Lock()
+
+
 def submit_paid_order_to_slant(order_id: str) -> None:
+    with _SUBMIT_LOCKS_GUARD:
+        entry = _SUBMIT_LOCKS.setdefault(order_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            # Re-reads the order under the lock, so a caller that waited sees the
+            # first caller's result (e.g. submitted_to_slant) and skips.
+            _submit_paid_order_to_slant_locked(order_id)
+    finally:
+        with _SUBMIT_LOCKS_GUARD:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _SUBMIT_LOCKS.pop(order_id, None)
+
+
+def _submit_paid_order_to_slant_locked(order_id: str) -> None:
     order = STORE.get(order_id) or {}
     status = order.get("status")
 
     if status == "submitted_to_slant":
-        print(
-            f"🟡 Slant already done for order_id={order_id} "
-            f"status={status}, skipping."
-        )
+        log.info("🟡 Slant already done for order_id=%s status=%s, skipping.", order_id, status)
         return
 
     if not CFG.slant_enabled:
@@ -1600,38 +2871,61 @@ def submit_paid_order_to_slant(order_id: str) -> None:
             f"Missing STL(s) on server for job_id(s): {missing}"
         )
 
-    _set_slant_step(order_id, "uploading_files")
-    _set_order_status(order_id, "slant_submitting")
+    _set_slant_step(order_id, "uploading_files", status="slant_submitting")
 
-    # Save each successful file ID immediately so retries resume safely.
+    pending: List[Tuple[str, dict]] = []
     for it in items:
         job_id = (it.get("job_id") or "").strip()
         if not job_id:
             raise RuntimeError("Item missing job_id")
-
         if not it.get("publicFileServiceId"):
-            it["publicFileServiceId"] = slant_upload_stl(job_id, owner_id=order_id)
-
-            def _persist_one_file(
-                order_obj: Dict[str, Any],
-                saved_items=items,
-                saved_job_id=job_id,
-                saved_file_id=it["publicFileServiceId"],
-            ):
-                order_obj["items"] = saved_items
-                sl = order_obj.get("slant") or {}
-                sl["step"] = "file_uploaded"
-                sl["step_at"] = utc_iso()
-                sl["last_job_id"] = saved_job_id
-                sl["last_publicFileServiceId"] = saved_file_id
-                order_obj["slant"] = sl
-                return order_obj, True
+            pending.append((job_id, it))
+
+    # Upload the STLs concurrently (each is a slot request + S3 PUT + confirm),
+    # but save each successful file ID as soon as it lands so retries resume safely.
+    first_err: Optional[Exception] = None
+    if pending:
+        with ThreadPoolExecutor(
+            # The Slant rate limiter still paces the API calls across these threads.
+            max_workers=min(CFG.slant_upload_concurrency, len(pending)),
+            thread_name_prefix="slant-upload",
+        ) as pool:
+            futures = {
+                pool.submit(slant_upload_stl, job_id, owner_id=order_id): (job_id, it)
+                for job_id, it in pending
+            }
+            for fut in as_completed(futures):
+                job_id, it = futures[fut]
+                try:
+                    it["publicFileServiceId"] = fut.result()
+                except Exception as e:
+                    log.error("❌ Slant STL upload failed: order_id=%s job_id=%s: %s", order_id, job_id, e)
+                    first_err = first_err or e
+                    continue
 
-            STORE.update(order_id, _persist_one_file)
-            print(
-                f"💾 Saved Slant file progress: order_id={order_id} "
-                f"job_id={job_id}"
-            )
+                def _persist_one_file(
+                    order_obj: Dict[str, Any],
+                    saved_items=items,
+                    saved_job_id=job_id,
+                    saved_file_id=it["publicFileServiceId"],
+                ):
+                    order_obj["items"] = saved_items
+                    _merge_slant(
+                        order_obj,
+                        {
+                            "step": "file_uploaded",
+                            "step_at": utc_iso(),
+                            "last_job_id": saved_job_id,
+                            "last_publicFileServiceId": saved_file_id,
+                        },
+                    )
+                    return order_obj, True
+
+                STORE.update(order_id, _persist_one_file)
+                log.info("💾 Saved Slant file progress: order_id=%s job_id=%s", order_id, job_id)
+
+    if first_err is not None:
+        raise first_err
 
     # Resume an already-drafted order when only the process step failed.
     latest = STORE.get(order_id) or {}
@@ -1641,21 +2935,30 @@ def submit_paid_order_to_slant(order_id: str) -> None:
     ).strip()
 
     if public_order_id:
-        print(
-            f"↩️ Resuming existing Slant order: "
-            f"order_id={order_id} publicOrderId={public_order_id}"
-        )
+        log.info("↩️ Resuming existing Slant order: order_id=%s publicOrderId=%s", order_id, public_order_id)
     else:
-        _set_slant_step(order_id, "drafting_order")
-        public_order_id = slant_draft_order(order_id, shipping, items)
-
-        # Save before processing to reduce duplicate-order risk on retry.
-        _set_slant_step(
-            order_id,
-            "order_drafted",
-            {"publicOrderId": public_order_id},
-        )
+        # Reuse the payload built by an earlier attempt unless items/shipping changed.
+        fingerprint = slant_payload_fingerprint(shipping, items)
+        payload = latest_slant.get("draft_payload")
+        if payload and latest_slant.get("draft_payload_fp") == fingerprint:
+            _set_slant_step(order_id, "drafting_order")
+        else:
+            payload = build_slant_draft_payload(order_id, shipping, items)
+            _set_slant_step(
+                order_id,
+                "drafting_order",
+                {"draft_payload": payload, "draft_payload_fp": fingerprint},
+            )
 
+        try:
+            public_order_id = slant_draft_order(order_id, shipping, items, payload=payload)
+        except SlantError as e:
+            # A 4xx may be the cached filament going unavailable; rebuild next attempt.
+            if 400 <= e.status < 500:
+                _set_slant_step(order_id, "drafting_order", {"draft_payload_fp": ""})
+            raise
+
+    # Saving publicOrderId before processing reduces duplicate-order risk on retry.
     _set_slant_step(
         order_id,
         "processing_order",
@@ -1663,29 +2966,30 @@ def submit_paid_order_to_slant(order_id: str) -> None:
     )
     process_resp = slant_process_order(public_order_id)
 
+    stored_resp = bounded_for_store(process_resp)
+
     def _persist_done(order_obj: Dict[str, Any]):
-        sl = order_obj.get("slant") or {}
-        sl["publicOrderId"] = public_order_id
-        sl["processResponse"] = process_resp
-        sl["step"] = "submitted"
-        sl["step_at"] = utc_iso()
-        sl["retry_exhausted"] = False
+        sl = _merge_slant(
+            order_obj,
+            {
+                "publicOrderId": public_order_id,
+                "processResponse": stored_resp,
+                "step": "submitted",
+                "step_at": utc_iso(),
+                "retry_exhausted": False,
+            },
+        )
         sl.pop("next_retry_at", None)
         sl.pop("last_error", None)
 
-        order_obj["slant"] = sl
-        order_obj["status"] = "submitted_to_slant"
-        order_obj["items"] = items
+        order_obj |= {"status": "submitted_to_slant", "items": items}
         order_obj.pop("slant_error", None)
         order_obj.pop("slant_error_trace", None)
         return order_obj, True
 
     STORE.update(order_id, _persist_done)
 
-    print(
-        f"✅ Slant submission complete: order_id={order_id} "
-        f"publicOrderId={public_order_id}"
-    )
+    log.info("✅ Slant submission complete: order_id=%s publicOrderId=%s", order_id, public_order_id)
 
 
 # Attempt 1 is immediate. Later attempts wait 30 sec, 2 min, 5 min, 15 min.
@@ -1731,135 +3035,173 @@ def _record_retry_wait(
     err: str,
 ) -> None:
     next_retry_at = (
-        datetime.utcnow() + timedelta(seconds=next_delay_sec)
+        utc_now() + timedelta(seconds=next_delay_sec)
     ).isoformat() + "Z"
 
     def _fn(order: Dict[str, Any]):
-        order["status"] = "paid_pending_fulfillment"
-        order["status_at"] = utc_iso()
-        order["slant_error"] = err
-
-        sl = order.get("slant") or {}
-        sl["step"] = "retry_wait"
-        sl["step_at"] = utc_iso()
-        sl["retry_count"] = attempt_number
-        sl["max_attempts"] = len(SLANT_RETRY_DELAYS_SEC)
-        sl["next_retry_at"] = next_retry_at
-        sl["last_error"] = err
-        sl["retry_exhausted"] = False
-        order["slant"] = sl
+        now = utc_iso()
+        order |= {
+            "status": "paid_pending_fulfillment",
+            "status_at": now,
+            "slant_error": err,
+        }
+        _merge_slant(
+            order,
+            {
+                "step": "retry_wait",
+                "step_at": now,
+                "retry_count": attempt_number,
+                "max_attempts": len(SLANT_RETRY_DELAYS_SEC),
+                "next_retry_at": next_retry_at,
+                "last_error": err,
+                "retry_exhausted": False,
+            },
+        )
         return order, True
 
     STORE.update(order_id, _fn)
 
 
-def _sleep_before_retry(order_id: str, delay_sec: int) -> bool:
-    """Return False if another request already completed the order."""
-    deadline = time.time() + max(0, delay_sec)
+class SlantJobQueue:
+    """
+    Bounded queue of Slant submission attempts, consumed by a fixed pool of
+    worker threads. Retries are queued with a due time instead of parking a
+    sleeping thread per order, so a burst of paid orders (or a Slant outage
+    with every order in retry_wait) costs SLANT_WORKERS threads, not one each.
+    """
 
-    while time.time() < deadline:
-        order = STORE.get(order_id) or {}
-        if order.get("status") == "submitted_to_slant":
-            return False
-        time.sleep(min(5, max(0.1, deadline - time.time())))
+    def __init__(self, maxsize: int, workers: int):
+        self.maxsize = maxsize
+        self.workers = workers
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._cv = threading.Condition()
+        self._seq = 0
+        self._started = False
+
+    def put(self, order_id: str, attempt_number: int, delay_sec: float = 0.0) -> bool:
+        with self._cv:
+            if len(self._heap) >= self.maxsize:
+                return False
+            if not self._started:
+                self._started = True
+                for i in range(self.workers):
+                    threading.Thread(target=self._worker, daemon=True, name=f"slant-worker-{i}").start()
+            self._seq += 1
+            heapq.heappush(self._heap, (time.time() + max(0.0, delay_sec), self._seq, order_id, attempt_number))
+            self._cv.notify()
+            return True
 
-    return True
+    def get(self) -> Tuple[str, int]:
+        with self._cv:
+            while True:
+                if not self._heap:
+                    self._cv.wait()
+                    continue
+                wait = self._heap[0][0] - time.time()
+                if wait > 0:
+                    self._cv.wait(wait)
+                    continue
+                _, _, order_id, attempt_number = heapq.heappop(self._heap)
+                return order_id, attempt_number
 
+    def __len__(self) -> int:
+        with self._cv:
+            return len(self._heap)
 
-def submit_to_slant_async(order_id: str) -> None:
-    order_id = (order_id or "").strip()
-    if not order_id:
-        return
+    def _worker(self) -> None:
+        while True:
+            order_id, attempt_number = self.get()
+            try:
+                _run_slant_attempt(order_id, attempt_number)
+            except Exception as e:
+                log.error("❌ Slant worker crashed on order_id=%s: %s", order_id, e)
+                with _SLANT_ACTIVE_LOCK:
+                    _SLANT_ACTIVE_ORDERS.discard(order_id)
 
-    with _SLANT_ACTIVE_LOCK:
-        if order_id in _SLANT_ACTIVE_ORDERS:
-            print(
-                f"🟡 Slant retry worker already active: order_id={order_id}"
-            )
+
+SLANT_WORKERS = 4
+SLANT_QUEUE = SlantJobQueue(maxsize=1024, workers=SLANT_WORKERS)
+
+
+def _run_slant_attempt(order_id: str, attempt_number: int) -> None:
+    finished = True
+    try:
+        current = STORE.get(order_id) or {}
+        if current.get("status") == "submitted_to_slant":
+            if attempt_number > 1:
+                log.info("🟡 Retry canceled because order is already submitted: order_id=%s", order_id)
             return
-        _SLANT_ACTIVE_ORDERS.add(order_id)
 
-    def _run():
-        print(f"🧵 Slant retry worker started: order_id={order_id}")
+        log.info("➡️ Slant attempt %s/%s order_id=%s", attempt_number, len(SLANT_RETRY_DELAYS_SEC), order_id)
 
         try:
-            for attempt_number, delay_before_attempt in enumerate(
-                SLANT_RETRY_DELAYS_SEC,
-                start=1,
-            ):
-                if delay_before_attempt > 0:
-                    if not _sleep_before_retry(
-                        order_id,
-                        delay_before_attempt,
-                    ):
-                        print(
-                            f"🟡 Retry canceled because order is already "
-                            f"submitted: order_id={order_id}"
-                        )
-                        return
-
-                current = STORE.get(order_id) or {}
-                if current.get("status") == "submitted_to_slant":
-                    return
-
-                print(
-                    f"➡️ Slant attempt {attempt_number}/"
-                    f"{len(SLANT_RETRY_DELAYS_SEC)} "
-                    f"order_id={order_id}"
-                )
+            submit_paid_order_to_slant(order_id)
+            log.info("🧵 Slant submission worker finished: order_id=%s", order_id)
+            return
 
-                try:
-                    submit_paid_order_to_slant(order_id)
-                    print(
-                        f"🧵 Slant retry worker finished: "
-                        f"order_id={order_id}"
-                    )
-                    return
+        except Exception as exc:
+            last_error = str(exc)
+            last_trace = traceback.format_exc()
+            retryable = _is_retryable_slant_error(exc)
+            is_last_attempt = (
+                attempt_number == len(SLANT_RETRY_DELAYS_SEC)
+            )
 
-                except Exception as exc:
-                    last_error = str(exc)
-                    last_trace = traceback.format_exc()
-                    retryable = _is_retryable_slant_error(exc)
-                    is_last_attempt = (
-                        attempt_number == len(SLANT_RETRY_DELAYS_SEC)
-                    )
+            log.error(
+                "❌ Slant attempt %s failed: order_id=%s retryable=%s error=%s\n%s",
+                attempt_number,
+                order_id,
+                retryable,
+                exc,
+                last_trace,
+            )
 
-                    print(
-                        f"❌ Slant attempt {attempt_number} failed: "
-                        f"order_id={order_id} retryable={retryable} "
-                        f"error={exc}\n{last_trace}"
-                    )
+            if not retryable or is_last_attempt:
+                _set_slant_failed(
+                    order_id,
+                    last_error,
+                    last_trace,
+                    attempts=attempt_number,
+                )
+                return
 
-                    if not retryable or is_last_attempt:
-                        _set_slant_failed(
-                            order_id,
-                            last_error,
-                            last_trace,
-                            attempts=attempt_number,
-                        )
-                        return
-
-                    next_delay = SLANT_RETRY_DELAYS_SEC[attempt_number]
-                    _record_retry_wait(
-                        order_id,
-                        attempt_number,
-                        next_delay,
-                        last_error,
-                    )
-                    print(
-                        f"⏳ Slant retry scheduled: order_id={order_id} "
-                        f"in={next_delay}s"
-                    )
+            next_delay = SLANT_RETRY_DELAYS_SEC[attempt_number]
+            _record_retry_wait(
+                order_id,
+                attempt_number,
+                next_delay,
+                last_error,
+            )
+            if SLANT_QUEUE.put(order_id, attempt_number + 1, next_delay):
+                finished = False
+                log.warning("⏳ Slant retry scheduled: order_id=%s in=%ss", order_id, next_delay)
+            else:
+                log.error("🚨 Slant queue full; retry not scheduled: order_id=%s", order_id)
 
-        finally:
+    finally:
+        if finished:
             with _SLANT_ACTIVE_LOCK:
                 _SLANT_ACTIVE_ORDERS.discard(order_id)
 
-    threading.Thread(
-        target=_run,
-        daemon=True,
-        name=f"slant-retry-{order_id[:8]}",
-    ).start()
+
+def submit_to_slant_async(order_id: str) -> None:
+    order_id = (order_id or "").strip()
+    if not order_id:
+        return
+
+    with _SLANT_ACTIVE_LOCK:
+        if order_id in _SLANT_ACTIVE_ORDERS:
+            log.info("🟡 Slant submission already queued: order_id=%s", order_id)
+            return
+        _SLANT_ACTIVE_ORDERS.add(order_id)
+
+    if not SLANT_QUEUE.put(order_id, 1):
+        with _SLANT_ACTIVE_LOCK:
+            _SLANT_ACTIVE_ORDERS.discard(order_id)
+        log.error("🚨 Slant queue full (%s); order left for recovery: order_id=%s", SLANT_QUEUE.maxsize, order_id)
+        return
+
+    log.info("🧵 Slant submission queued: order_id=%s depth=%s", order_id, len(SLANT_QUEUE))
 
 
 def _recover_pending_slant_orders() -> None:
@@ -1881,7 +3223,9 @@ def _recover_pending_slant_orders() -> None:
         "slant_failed",
     }
 
-    for order_id, order in STORE.all_orders().items():
+    # Only the orders in a recoverable status are read, not the whole store.
+    for order_id in [oid for s in recoverable_statuses for oid in STORE.ids_by_status(s)]:
+        order = STORE.get(order_id) or {}
         status = str(order.get("status") or "")
         if status not in recoverable_statuses:
             continue
@@ -1896,10 +3240,7 @@ def _recover_pending_slant_orders() -> None:
         if missing:
             continue
 
-        print(
-            f"♻️ Recovering pending Slant order: "
-            f"order_id={order_id} status={status}"
-        )
+        log.info("♻️ Recovering pending Slant order: order_id=%s status=%s", order_id, status)
         submit_to_slant_async(order_id)
 
 
@@ -1911,10 +3252,7 @@ def _start_slant_recovery_worker() -> None:
             try:
                 _recover_pending_slant_orders()
             except Exception as exc:
-                print(
-                    f"⚠️ Slant recovery scan failed: {exc}\n"
-                    f"{traceback.format_exc()}"
-                )
+                log.warning("⚠️ Slant recovery scan failed: %s\n%s", exc, traceback.format_exc())
             time.sleep(300)
 
     threading.Thread(
@@ -1924,6 +3262,69 @@ def _start_slant_recovery_worker() -> None:
     ).start()
 
 
+# ----------------------------
+# Webhook idempotency
+# ----------------------------
+WEBHOOK_EVENT_TTL_SEC = 86400
+_SEEN_EVENTS_MAX = 10_000
+_SEEN_EVENTS: "OrderedDict[str, float]" = OrderedDict()
+_SEEN_EVENTS_LOCK = threading.Lock()
+
+
+def _webhook_event_key(source: str, event_id: str) -> str:
+    return f"{source}:evt:{event_id}"
+
+
+def claim_webhook_event(source: str, event_id: Any, created: Any = None) -> bool:
+    """
+    Return True the first time an event id is seen and False for redeliveries.
+
+    Uses Redis SET NX (shared across workers) when REDIS_URL is configured,
+    otherwise an in-process LRU capped at 10k ids. Events without an id are
+    always processed.
+    """
+    event_id = str(event_id or "").strip()
+    if not event_id:
+        return True
+    key = _webhook_event_key(source, event_id)
+
+    if REDIS is not None:
+        try:
+            marker = str(created or int(time.time()))
+            return bool(REDIS.set(key, marker, nx=True, ex=WEBHOOK_EVENT_TTL_SEC))
+        except Exception as e:
+            log.warning("⚠️ Redis webhook dedupe failed, using memory: %s", e)
+
+    now = time.time()
+    with _SEEN_EVENTS_LOCK:
+        seen_at = _SEEN_EVENTS.get(key)
+        if seen_at is not None and (now - seen_at) < WEBHOOK_EVENT_TTL_SEC:
+            _SEEN_EVENTS.move_to_end(key)
+            return False
+        _SEEN_EVENTS[key] = now
+        _SEEN_EVENTS.move_to_end(key)
+        while len(_SEEN_EVENTS) > _SEEN_EVENTS_MAX:
+            _SEEN_EVENTS.popitem(last=False)
+    return True
+
+
+def release_webhook_event(source: str, event_id: Any) -> None:
+    """Forget a claimed event so a redelivery is processed after a handler error."""
+    event_id = str(event_id or "").strip()
+    if not event_id:
+        return
+    key = _webhook_event_key(source, event_id)
+
+    if REDIS is not None:
+        try:
+            REDIS.delete(key)
+        except Exception:
+            pass
+
+    with _SEEN_EVENTS_LOCK:
+        _SEEN_EVENTS.pop(key, None)
+
+
 # ----------------------------
 # Read-only production monitoring
 # ----------------------------
@@ -2012,7 +3413,7 @@ def _require_admin():
 
 
 def _build_monitor_status() -> Dict[str, Any]:
-    now = datetime.utcnow()
+    now = utc_now()
     lookback_hours = max(1, int(CFG.monitor_lookback_hours or 48))
     stuck_minutes = max(1, int(CFG.monitor_stuck_minutes or 15))
     cutoff = now - timedelta(hours=lookback_hours)
@@ -2149,6 +3550,7 @@ def health():
             "public_base_url": CFG.public_base_url,
             "upload_dir": CFG.upload_dir,
             "orders": STORE.count(),
+            "order_store_backend": CFG.order_store_backend,
             "filaments_cache_ttl_sec": _FILAMENT_CACHE_TTL_SEC,
             "slant_file_url_field": CFG.slant_file_url_field,
             "slant_stl_route": CFG.slant_stl_route,
@@ -2240,7 +3642,7 @@ def success():
             if charges and isinstance(charges[0], dict):
                 receipt_url = charges[0].get("receipt_url") or ""
     except Exception as e:
-        print(f"⚠️ success() receipt lookup failed: {e}")
+        log.warning("⚠️ success() receipt lookup failed: %s", e)
 
     app_url = f"krezzapp://order-confirmed?order_id={order_id}&session_id={session_id}"
 
@@ -2293,9 +3695,9 @@ def cancel():
     if order_id:
         try:
             released = QUOTA.release_reservation(order_id)
-            print(f"🧮 QUOTA release (cancel): order_id={order_id} released={released}")
+            log.info("🧮 QUOTA release (cancel): order_id=%s released=%s", order_id, released)
         except Exception as e:
-            print(f"🧯 QUOTA release (cancel) error: {e}")
+            log.warning("🧯 QUOTA release (cancel) error: %s", e)
 
     esc_order = html.escape(order_id)
     page = f"""
@@ -2313,18 +3715,126 @@ def cancel():
 
 
 # --- uploads + STL serving ---
+UPLOAD_CHUNK_BYTES = 64 * 1024
+UPLOAD_COPY_BYTES = 1024 * 1024
+
+
+# mkstemp creates files 0600; uploads get the umask-governed mode a plain open()
+# would give them, so a proxy running as another user can still serve them.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+UPLOAD_FILE_MODE = 0o666 & ~_UMASK
+
+
+def _fsync_path(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _save_upload_atomic(src, save_path: str) -> None:
+    """
+    Copy an uploaded file stream into UPLOAD_DIR in 1 MiB chunks via a .part
+    temp file, fsync it, then os.replace() it into place so a crash or a
+    concurrent download never sees a half-written STL.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix="upload_", suffix=".part", dir=CFG.upload_dir)
+    try:
+        with os.fdopen(fd, "wb", buffering=UPLOAD_COPY_BYTES) as out:
+            shutil.copyfileobj(src, out, length=UPLOAD_COPY_BYTES)
+            os.fchmod(out.fileno(), UPLOAD_FILE_MODE)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, save_path)
+        fsync_dir(CFG.upload_dir)
+    finally:
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except Exception:
+            pass
+
+
+def _stream_upload_to_disk() -> Tuple[str, str, str]:
+    """
+    Parse the multipart body straight off request.stream so the STL is written
+    to UPLOAD_DIR as it arrives (no Werkzeug spool file + second copy).
+
+    The file part lands in a temp file first because job_id may arrive after it;
+    the temp file is renamed into place once the job_id is known.
+    Returns (job_id, order_id, save_path); save_path is "" when job_id or file is missing.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix="upload_", suffix=".part", dir=CFG.upload_dir)
+    os.close(fd)
+    try:
+        parser = StreamingFormDataParser(headers=request.headers)
+        file_target = FileTarget(tmp_path)
+        job_target = ValueTarget()
+        order_target = ValueTarget()
+        parser.register("file", file_target)
+        parser.register("job_id", job_target)
+        parser.register("order_id", order_target)
+
+        stream = request.stream
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            parser.data_received(chunk)
+
+        job_id = job_target.value.decode("utf-8", "replace").strip()
+        order_id = order_target.value.decode("utf-8", "replace").strip()
+        if not job_id or not file_target.multipart_filename or not is_safe_id(job_id):
+            return job_id, order_id, ""
+
+        save_path = stl_path_for(job_id)
+        os.chmod(tmp_path, UPLOAD_FILE_MODE)
+        _fsync_path(tmp_path)
+        os.replace(tmp_path, save_path)
+        fsync_dir(CFG.upload_dir)
+        return job_id, order_id, save_path
+    finally:
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except Exception:
+            pass
+
+
 @app.route("/upload", methods=["POST"])
 def upload_stl():
-    job_id = (request.form.get("job_id") or "").strip()
-    order_id = (request.form.get("order_id") or "").strip()
-    file = request.files.get("file")
+    if request.content_length and request.content_length > CFG.max_upload_bytes:
+        return jsonify({"error": "File too large", "max_bytes": CFG.max_upload_bytes}), 413
 
-    if not job_id or not file:
-        return jsonify({"error": "Missing job_id or file"}), 400
+    if StreamingFormDataParser is not None and request.mimetype == "multipart/form-data":
+        try:
+            job_id, order_id, save_path = _stream_upload_to_disk()
+        except RequestEntityTooLarge:
+            return jsonify({"error": "File too large", "max_bytes": CFG.max_upload_bytes}), 413
+        except Exception as e:
+            log.error("❌ Upload parse failed: %s", e)
+            return jsonify({"error": "Malformed multipart upload"}), 400
+        if not save_path:
+            if job_id and not is_safe_id(job_id):
+                return jsonify({"error": "Invalid job_id"}), 400
+            return jsonify({"error": "Missing job_id or file"}), 400
+    else:
+        job_id = (request.form.get("job_id") or "").strip()
+        order_id = (request.form.get("order_id") or "").strip()
+        file = request.files.get("file")
+
+        if not job_id or not file:
+            return jsonify({"error": "Missing job_id or file"}), 400
+        if not is_safe_id(job_id):
+            return jsonify({"error": "Invalid job_id"}), 400
 
-    save_path = stl_path_for(job_id)
-    file.save(save_path)
-    print(f"✅ Uploaded STL job_id={job_id} -> {save_path} order_id={order_id or 'none'}")
+        save_path = stl_path_for(job_id)
+        _save_upload_atomic(file.stream, save_path)
+
+    _forget_stl_stat(job_id)
+    log.info("✅ Uploaded STL job_id=%s -> %s order_id=%s", job_id, save_path, order_id or "none")
 
     if order_id:
 
@@ -2341,67 +3851,132 @@ def upload_stl():
             if order.get("status") == "paid_waiting_for_stl":
                 missing = missing_stls_for_items(order.get("items") or [])
                 if not missing:
-                    print(f"➡️ Upload completed missing STLs resolved; queueing Slant submit: order_id={order_id}")
+                    log.info("➡️ Upload completed missing STLs resolved; queueing Slant submit: order_id=%s", order_id)
                     submit_to_slant_async(order_id)
 
     return jsonify({"success": True, "job_id": job_id, "path": save_path})
 
 
-def _head_for_file(path: str, content_type: str):
-    size = os.path.getsize(path)
+def _stl_etag(st: os.stat_result) -> str:
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+# Slant polls the same few STLs while a job prints; remember their stat() for a
+# short while (LRU) so a conditional re-fetch or HEAD costs no syscall at all.
+# Uploads drop the entry; the TTL bounds staleness if another process replaces a file.
+STL_STAT_CACHE_MAX = 256
+STL_STAT_CACHE_TTL_SEC = 30.0
+_STL_STATS: "OrderedDict[str, Tuple[float, os.stat_result]]" = OrderedDict()
+_STL_STATS_LOCK = threading.Lock()
+
+
+def _stl_stat(job_id: str, path: str) -> os.stat_result:
+    """os.stat() of an STL, served from the LRU while fresh. Raises FileNotFoundError."""
+    now = time.monotonic()
+    with _STL_STATS_LOCK:
+        hit = _STL_STATS.get(job_id)
+        if hit is not None and now - hit[0] < STL_STAT_CACHE_TTL_SEC:
+            _STL_STATS.move_to_end(job_id)
+            return hit[1]
+
+    st = os.stat(path)
+    with _STL_STATS_LOCK:
+        _STL_STATS[job_id] = (now, st)
+        _STL_STATS.move_to_end(job_id)
+        while len(_STL_STATS) > STL_STAT_CACHE_MAX:
+            _STL_STATS.popitem(last=False)
+    return st
+
+
+def _forget_stl_stat(job_id: str) -> None:
+    with _STL_STATS_LOCK:
+        _STL_STATS.pop(job_id, None)
+
+
+def _head_for_file(st: os.stat_result, content_type: str):
     resp = make_response("", 200)
     resp.headers["Content-Type"] = content_type
-    resp.headers["Content-Length"] = str(size)
+    resp.headers["Content-Length"] = str(st.st_size)
     resp.headers["Accept-Ranges"] = "bytes"
     resp.headers["Cache-Control"] = "no-store"
+    resp.set_etag(_stl_etag(st))
     return resp
 
 
-@app.route("/stl-raw/<job_id>.stl", methods=["GET", "HEAD"])
-def serve_stl_raw(job_id: str):
-    p = stl_path_for(job_id)
-    if not os.path.exists(p):
-        return abort(404)
-
-    if request.method == "HEAD":
-        return _head_for_file(p, "application/octet-stream")
-
-    resp = send_file(
-        p,
-        mimetype="application/octet-stream",
-        as_attachment=False,
-        download_name=f"{job_id}.stl",
-        conditional=True,
-        etag=True,
+def _file_response(f, st: os.stat_result, mimetype: str, download_name: str):
+    """
+    send_file(conditional=True) equivalent for an already-open file, using the
+    caller's stat() result for Content-Length / ETag / Last-Modified.
+    """
+    resp = app.response_class(
+        wrap_file(request.environ, f),
+        mimetype=mimetype,
+        direct_passthrough=True,
     )
+    resp.content_length = st.st_size
+    resp.last_modified = st.st_mtime
+    resp.set_etag(_stl_etag(st))
+    resp.headers["Content-Disposition"] = f'inline; filename="{download_name}"'
     resp.headers["Cache-Control"] = "no-store"
-    resp.headers["Accept-Ranges"] = "bytes"
-    return resp
+    return resp.make_conditional(request, accept_ranges=True, complete_length=st.st_size)
 
 
-@app.route("/stl-full/<job_id>.stl", methods=["GET", "HEAD"])
-def serve_stl_full(job_id: str):
+def _serve_stl(job_id: str, mimetype: str):
     p = stl_path_for(job_id)
-    if not os.path.exists(p):
+    try:
+        st = _stl_stat(job_id, p)
+    except FileNotFoundError:
         return abort(404)
 
+    # Slant re-fetching an unchanged STL: answer from the stat() alone, no open().
+    etag = _stl_etag(st)
+    if request.if_none_match.contains(etag):
+        resp = make_response("", 304)
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-store"
+        return resp
+
     if request.method == "HEAD":
-        return _head_for_file(p, "model/stl")
-
-    resp = send_file(
-        p,
-        mimetype="model/stl",
-        as_attachment=False,
-        download_name=f"{job_id}.stl",
-        conditional=True,
-        etag=True,
-    )
-    resp.headers["Cache-Control"] = "no-store"
-    resp.headers["Accept-Ranges"] = "bytes"
-    return resp
+        return _head_for_file(st, mimetype)
+
+    if CFG.stl_accel_redirect_prefix or CFG.stl_use_x_sendfile:
+        # The proxy sendfile()s the STL straight from disk; the worker is freed immediately.
+        resp = make_response("", 200)
+        if CFG.stl_accel_redirect_prefix:
+            resp.headers["X-Accel-Redirect"] = f"{CFG.stl_accel_redirect_prefix}/{job_id}.stl"
+        else:
+            resp.headers["X-Sendfile"] = os.path.abspath(p)
+        resp.headers["Content-Type"] = mimetype
+        resp.headers["Content-Disposition"] = f'inline; filename="{job_id}.stl"'
+        resp.headers["Cache-Control"] = "no-store"
+        resp.last_modified = st.st_mtime
+        resp.set_etag(_stl_etag(st))
+        # Slant's re-fetch of an unchanged STL gets a 304 without involving the proxy.
+        return resp.make_conditional(request)
+
+    try:
+        f = open(p, "rb")
+    except FileNotFoundError:
+        _forget_stl_stat(job_id)
+        return abort(404)
+    # fstat on the open fd is cheap and describes exactly the bytes we'll send.
+    fst = os.fstat(f.fileno())
+    if (fst.st_mtime_ns, fst.st_size) != (st.st_mtime_ns, st.st_size):
+        _forget_stl_stat(job_id)
+    return _file_response(f, fst, mimetype, f"{job_id}.stl")
+
+
+@app.route("/stl-raw/<safe_id:job_id>.stl", methods=["GET", "HEAD"])
+def serve_stl_raw(job_id: str):
+    return _serve_stl(job_id, "application/octet-stream")
 
 
-@app.route("/debug/stl/info/<job_id>", methods=["GET"])
+@app.route("/stl-full/<safe_id:job_id>.stl", methods=["GET", "HEAD"])
+def serve_stl_full(job_id: str):
+    return _serve_stl(job_id, "model/stl")
+
+
+@app.route("/debug/stl/info/<safe_id:job_id>", methods=["GET"])
 def debug_stl_info(job_id: str):
     denied = _require_admin()
     if denied is not None:
@@ -2410,14 +3985,13 @@ def debug_stl_info(job_id: str):
     if not os.path.exists(p):
         return jsonify({"ok": False, "error": "not found", "path": p}), 404
     size = os.path.getsize(p)
-    route = "stl-full" if CFG.slant_stl_route == "full" else "stl-raw"
     return jsonify(
         {
             "ok": True,
             "job_id": job_id,
             "path": p,
             "size_bytes": size,
-            "public_url": f"{CFG.public_base_url}/{route}/{job_id}.stl",
+            "public_url": stl_public_url(job_id),
             "slant_stl_route": CFG.slant_stl_route,
         }
     )
@@ -2428,7 +4002,7 @@ def debug_stl_info(job_id: str):
 def create_checkout_session():
     try:
         data = request.get_json(silent=True) or {}
-        print("📥 /create-checkout-session payload:", {"keys": list(data.keys())})
+        log.info("📥 /create-checkout-session payload: %s", {"keys": list(data.keys())})
 
         items = data.get("items", []) or []
         shipping_info = data.get("shippingInfo", {}) or {}
@@ -2436,12 +4010,17 @@ def create_checkout_session():
             return jsonify({"error": "No items provided"}), 400
 
         order_id = (data.get("order_id") or "").strip() or str(uuid.uuid4())
+        # Same id rules as /order-data/<order_id>, or the client could never poll this order.
+        if not is_safe_id(order_id):
+            return jsonify({"error": "Invalid order_id"}), 400
 
         email = (shipping_info.get("email") or "").strip() or None
         if email:
             shipping_info["email"] = email
 
+        # One pass: normalize each item and build its Stripe line item.
         normalized_items = []
+        line_items = []
         for it in items:
             job_id = (it.get("job_id") or it.get("jobId") or "").strip()
             if not job_id:
@@ -2454,10 +4033,38 @@ def create_checkout_session():
                     ),
                     400,
                 )
+            if not is_safe_id(job_id):
+                return jsonify({"error": "Invalid job_id", "job_id": job_id[:64]}), 400
+
+            quantity = safe_int(it.get("quantity", 1), -1)
+            unit_amount = safe_int(it.get("price", 7500), -1)
+            if quantity < 1 or unit_amount < 0:
+                # Bad client input is a 400, not a 500 from int() deep in the handler.
+                return (
+                    jsonify(
+                        {
+                            "error": "Invalid quantity or price on item",
+                            "job_id": job_id,
+                        }
+                    ),
+                    400,
+                )
 
             it["job_id"] = job_id
-            it["quantity"] = int(it.get("quantity", 1))
+            it["quantity"] = quantity
             normalized_items.append(it)
+            line_items.append(
+                {
+                    "price_data": {
+                        "currency": "usd",
+                        "product_data": {
+                            "name": it.get("name", "Beard Mold"),
+                        },
+                        "unit_amount": unit_amount,
+                    },
+                    "quantity": quantity,
+                }
+            )
 
         if CFG.require_stl_before_checkout:
             missing = missing_stls_for_items(normalized_items)
@@ -2474,10 +4081,10 @@ def create_checkout_session():
                 )
 
         q_ok, q_info = QUOTA.reserve(order_id)
-        print(f"🧮 QUOTA reserve: order_id={order_id} ok={q_ok} info={q_info}")
+        log.info("🧮 QUOTA reserve: order_id=%s ok=%s info=%s", order_id, q_ok, q_info)
 
         if not q_ok:
-            print(f"🚫 DAILY CAP HIT: order_id={order_id} info={q_info}")
+            log.warning("🚫 DAILY CAP HIT: order_id=%s info=%s", order_id, q_info)
             return (
                 jsonify(
                     {
@@ -2504,20 +4111,6 @@ def create_checkout_session():
             },
         )
 
-        line_items = [
-            {
-                "price_data": {
-                    "currency": "usd",
-                    "product_data": {
-                        "name": it.get("name", "Beard Mold"),
-                    },
-                    "unit_amount": int(it.get("price", 7500)),
-                },
-                "quantity": int(it.get("quantity", 1)),
-            }
-            for it in normalized_items
-        ]
-
         idem_key = f"checkout_{order_id}"
 
         session_kwargs = dict(
@@ -2552,22 +4145,24 @@ def create_checkout_session():
                 expires_at,
                 day=quota_day,
             )
-            print(
-                f"🧮 QUOTA attach_session: order_id={order_id} "
-                f"session={session_id} expires_at={expires_at}"
+            log.info(
+                "🧮 QUOTA attach_session: order_id=%s session=%s expires_at=%s",
+                order_id,
+                session_id,
+                expires_at,
             )
         except Exception as e:
-            print(f"🧯 QUOTA attach_session error: {e}")
+            log.warning("🧯 QUOTA attach_session error: %s", e)
 
         if not session_url:
             raise RuntimeError("Stripe checkout session created but no URL was returned.")
 
-        print(f"✅ Created checkout session: {session_id} order_id={order_id} email={email or 'none'}")
+        log.info("✅ Created checkout session: %s order_id=%s email=%s", session_id, order_id, email or "none")
         return jsonify({"url": session_url, "order_id": order_id})
 
     except Exception as e:
         tb = traceback.format_exc()
-        print(f"❌ Error in checkout session: {e}\n{tb}")
+        log.error("❌ Error in checkout session: %s\n%s", e, tb)
 
         try:
             if "reservation_created" in locals() and reservation_created and "order_id" in locals():
@@ -2589,14 +4184,27 @@ def stripe_webhook():
             CFG.stripe_endpoint_secret,
         )
     except Exception as e:
-        print(f"❌ Stripe webhook error: {e}")
+        log.error("❌ Stripe webhook error: %s", e)
         return "Webhook error", 400
 
     event_type = stripe_field(stripe_event, "type")
     event_id = stripe_field(stripe_event, "id")
     livemode = bool(stripe_field(stripe_event, "livemode", False))
-    print(f"📦 Stripe event: {event_type} ({event_id}) livemode={livemode}")
+    log.info("📦 Stripe event: %s (%s) livemode=%s", event_type, event_id, livemode)
+
+    # Stripe redelivers on timeouts/5xx; only the first delivery does any work.
+    if not claim_webhook_event("stripe", event_id, stripe_field(stripe_event, "created")):
+        log.info("🟡 Duplicate Stripe event ignored: %s (%s)", event_type, event_id)
+        return jsonify(success=True)
+
+    try:
+        return _handle_stripe_event(stripe_event, event_type, event_id, livemode)
+    except Exception:
+        release_webhook_event("stripe", event_id)
+        raise
 
+
+def _handle_stripe_event(stripe_event: Any, event_type: str, event_id: str, livemode: bool):
     if event_type == "checkout.session.completed":
         data_obj = stripe_field(stripe_event, "data", {}) or {}
         session = stripe_field(data_obj, "object", {}) or {}
@@ -2605,7 +4213,7 @@ def stripe_webhook():
         order_id = (stripe_field(metadata, "order_id", "") or "").strip()
 
         if not order_id:
-            print("❌ Missing order_id in Stripe metadata")
+            log.error("❌ Missing order_id in Stripe metadata")
             return jsonify(success=True)
 
         def _apply_payment(order_obj: Dict[str, Any]):
@@ -2633,7 +4241,7 @@ def stripe_webhook():
             created_iso = utc_iso()
             try:
                 if created_ts is not None:
-                    created_iso = datetime.utcfromtimestamp(int(created_ts)).isoformat() + "Z"
+                    created_iso = utc_iso_from_ts(int(created_ts))
             except Exception:
                 pass
 
@@ -2674,17 +4282,15 @@ def stripe_webhook():
 
         updated_order, changed = STORE.update(order_id, _apply_payment)
         payment_info = updated_order.get("payment") or {}
-        print(
-            f"✅ Checkout completed: order_id={order_id} "
-            f"payment_status={payment_info.get('status')} "
-            f"amount_total={payment_info.get('amount_total')}"
+        log.info(
+            "✅ Checkout completed: order_id=%s payment_status=%s amount_total=%s",
+            order_id,
+            payment_info.get('status'),
+            payment_info.get('amount_total'),
         )
 
         if not payment_info.get("fulfillment_allowed"):
-            print(
-                f"🟡 Fulfillment blocked because Stripe payment is not "
-                f"complete: order_id={order_id}"
-            )
+            log.warning("🟡 Fulfillment blocked because Stripe payment is not complete: order_id=%s", order_id)
             return jsonify(success=True)
 
         if changed:
@@ -2695,27 +4301,31 @@ def stripe_webhook():
                 day=q_day,
             )
             if not q_ok:
-                print(f"🟠 Paid but daily cap reached; holding fulfillment. info={q_info}")
-                _set_order_status(order_id, "paid_cap_hold", {"quota": q_info})
-                _set_slant_step(order_id, "cap_hold", {"quota": q_info})
+                log.warning("🟠 Paid but daily cap reached; holding fulfillment. info=%s", q_info)
+                _set_slant_step(
+                    order_id, "cap_hold", {"quota": q_info},
+                    status="paid_cap_hold", status_extra={"quota": q_info},
+                )
                 return jsonify(success=True)
 
         if CFG.slant_enabled and CFG.slant_auto_submit:
             session_livemode = bool(stripe_field(session, "livemode", livemode))
             if CFG.slant_require_live_stripe and not session_livemode:
-                print("🟡 Blocking Slant auto-submit (Stripe TEST). Set SLANT_REQUIRE_LIVE_STRIPE=false to allow test.")
+                log.warning("🟡 Blocking Slant auto-submit (Stripe TEST). Set SLANT_REQUIRE_LIVE_STRIPE=false to allow test.")
             else:
                 order = STORE.get(order_id) or {}
                 missing = missing_stls_for_items(order.get("items") or [])
                 if missing:
-                    print(f"🟡 Paid but missing STL(s): {missing} -> setting paid_waiting_for_stl")
-                    _set_order_status(order_id, "paid_waiting_for_stl", {"missing_stls": missing})
-                    _set_slant_step(order_id, "waiting_for_stl", {"missing_stls": missing})
+                    log.warning("🟡 Paid but missing STL(s): %s -> setting paid_waiting_for_stl", missing)
+                    _set_slant_step(
+                        order_id, "waiting_for_stl", {"missing_stls": missing},
+                        status="paid_waiting_for_stl", status_extra={"missing_stls": missing},
+                    )
                 else:
-                    print(f"➡️ Queueing Slant submit: order_id={order_id}")
+                    log.info("➡️ Queueing Slant submit: order_id=%s", order_id)
                     submit_to_slant_async(order_id)
         else:
-            print(f"🟡 SLANT_AUTO_SUBMIT={int(CFG.slant_auto_submit)} skipping Slant submission.")
+            log.info("🟡 SLANT_AUTO_SUBMIT=%s skipping Slant submission.", int(CFG.slant_auto_submit))
 
     elif event_type == "checkout.session.expired":
         data_obj = stripe_field(stripe_event, "data", {}) or {}
@@ -2740,9 +4350,19 @@ def stripe_webhook():
 
     return jsonify(success=True)
 # --- Slant webhook (order.shipped) ---
+# Keyed HMAC prepared once; each request copies it instead of re-running the key schedule.
+_SLANT_WEBHOOK_SECRET = (getattr(CFG, "slant_webhook_secret", "") or "").strip()
+_SLANT_HMAC = (
+    hmac.new(_SLANT_WEBHOOK_SECRET.encode("utf-8"), digestmod=hashlib.sha256)
+    if _SLANT_WEBHOOK_SECRET
+    else None
+)
+# Hex digests in X-Webhook-Signature-256: "sha256=<hex>", possibly several, comma separated.
+_SLANT_SIG_RE = re.compile(r"(?:sha256=)?([0-9A-Fa-f]+)")
+
+
 def verify_slant_webhook_signature(raw_body: bytes) -> Tuple[bool, str]:
-    secret = (getattr(CFG, "slant_webhook_secret", "") or "").strip()
-    if not secret:
+    if _SLANT_HMAC is None:
         return False, "SLANT_WEBHOOK_SECRET not set"
 
     timestamp = (request.headers.get("X-Webhook-Timestamp") or "").strip()
@@ -2765,19 +4385,36 @@ def verify_slant_webhook_signature(raw_body: bytes) -> Tuple[bool, str]:
     if age_ms < -30_000 or age_ms > 5 * 60 * 1000:
         return False, "Timestamp too old"
 
-    signed_payload = timestamp.encode("utf-8") + b"." + (raw_body or b"")
-    computed = hmac.new(secret.encode("utf-8"), signed_payload, hashlib.sha256).hexdigest()
+    mac = _SLANT_HMAC.copy()
+    mac.update(timestamp.encode("utf-8"))
+    mac.update(b".")
+    mac.update(raw_body or b"")
+    computed = mac.hexdigest().encode("ascii")
 
     # ✅ support "sha256=..." and also multiple values separated by commas
-    candidates = [s.strip() for s in sig_header.split(",") if s.strip()]
-    for cand in candidates:
-        expected = cand.replace("sha256=", "").strip()
-        if hmac.compare_digest(computed, expected):
+    for expected in _SLANT_SIG_RE.findall(sig_header):
+        # compare_digest is cheapest on equal-length bytes; anything else can't match.
+        if len(expected) == len(computed) and hmac.compare_digest(computed, expected.encode("ascii")):
             return True, "ok"
 
     return False, "Bad signature"
 
 
+# Field aliases Slant has used, in priority order; walked once per webhook.
+_SLANT_EVENT_ID_KEYS = ("event_id", "id")
+_SLANT_PUBLIC_ID_KEYS = ("public_id", "publicId")
+_SLANT_SHIPMENT_STATUS_KEYS = ("shipment_status", "status")
+
+
+def _first_str(obj: Dict[str, Any], keys: Tuple[str, ...], default: str = "") -> str:
+    """First non-empty value among `keys`, stripped."""
+    for k in keys:
+        v = obj.get(k)
+        if v:
+            return str(v).strip()
+    return default
+
+
 @app.route("/slant/webhook", methods=["POST"])
 @app.route("/slant-webhook", methods=["POST"])
 def slant_webhook():
@@ -2785,41 +4422,58 @@ def slant_webhook():
 
     ok, reason = verify_slant_webhook_signature(raw)
     if not ok:
-        print(f"❌ Slant webhook rejected: {reason}")
+        log.error("❌ Slant webhook rejected: %s", reason)
         return jsonify({"error": reason}), 401
 
+    # Parse the verified bytes once; request.get_json() would decode them again.
     try:
-        event = json.loads(raw.decode("utf-8"))
+        event = json_parse(raw)
     except Exception:
         return jsonify({"error": "Bad JSON"}), 400
+    if not isinstance(event, dict):
+        return jsonify({"error": "Bad JSON"}), 400
 
     event_type = (event.get("event_type") or "").strip()
     if event_type != "order.shipped":
         return jsonify({"ok": True, "ignored": event_type}), 200
 
-    data_obj = event.get("data") or {}
-    order_obj = data_obj.get("order") or {}
+    slant_event_id = _first_str(event, _SLANT_EVENT_ID_KEYS) or (request.headers.get("X-Webhook-Id") or "").strip()
+    if not claim_webhook_event("slant", slant_event_id, event.get("created_at")):
+        log.info("🟡 Duplicate Slant event ignored: %s (%s)", event_type, slant_event_id)
+        return jsonify({"ok": True, "duplicate": True}), 200
+
+    try:
+        return _handle_slant_shipped(event)
+    except Exception:
+        release_webhook_event("slant", slant_event_id)
+        raise
+
 
-    slant_public_id = (order_obj.get("public_id") or order_obj.get("publicId") or "").strip()
-    tracking_number = (order_obj.get("tracking_number") or "").strip()
-    shipment_status = (order_obj.get("shipment_status") or order_obj.get("status") or "SHIPPED").strip()
+def _handle_slant_shipped(event: Dict[str, Any]):
+    order_obj = (event.get("data") or {}).get("order") or {}
+
+    slant_public_id = _first_str(order_obj, _SLANT_PUBLIC_ID_KEYS)
+    tracking_number = str(order_obj.get("tracking_number") or "").strip()
+    shipment_status = _first_str(order_obj, _SLANT_SHIPMENT_STATUS_KEYS, "SHIPPED")
 
     if not slant_public_id:
         return jsonify({"ok": True, "warning": "missing public_id"}), 200
 
     internal_order_id = STORE.find_by_slant_public_order_id(slant_public_id)
     if not internal_order_id:
-        print(f"🟡 Slant shipped webhook unmatched: public_id={slant_public_id}")
+        log.warning("🟡 Slant shipped webhook unmatched: public_id=%s", slant_public_id)
         return jsonify({"ok": True, "unmatched": True}), 200
 
     def _apply_shipped(order_state: Dict[str, Any]):
         ful = order_state.get("fulfillment") or {}
-        ful["slant_public_id"] = slant_public_id
-        ful["status"] = "shipped"
-        ful["shipment_status"] = shipment_status
+        ful |= {
+            "slant_public_id": slant_public_id,
+            "status": "shipped",
+            "shipment_status": shipment_status,
+            "updated_at": utc_iso(),
+        }
         if tracking_number:
             ful["tracking_number"] = tracking_number
-        ful["updated_at"] = utc_iso()
         order_state["fulfillment"] = ful
 
         # mirror a couple fields into shipping for convenience
@@ -2842,17 +4496,32 @@ def slant_webhook():
 
     STORE.update(internal_order_id, _apply_shipped)
 
-    print(f"✅ Slant shipped saved: order_id={internal_order_id} tracking={tracking_number}")
+    log.info("✅ Slant shipped saved: order_id=%s tracking=%s", internal_order_id, tracking_number)
     return jsonify({"ok": True}), 200
 
 
 # --- order status ---
-@app.route("/order-data/<order_id>", methods=["GET"])
+@app.route("/order-data/<safe_id:order_id>", methods=["GET"])
 def get_order_data(order_id):
     data = STORE.get(order_id)
     if not data:
         return jsonify({"error": "Order ID not found"}), 404
-    return jsonify(
+
+    # Every store write stamps updated_at, so status + updated_at identifies the
+    # response; the client's status poll gets a 304 without re-serializing.
+    etag = ""
+    if data.get("updated_at"):
+        etag = hashlib.blake2b(
+            f"{data.get('status', 'created')}|{data['updated_at']}".encode("utf-8"),
+            digest_size=8,
+        ).hexdigest()
+        if request.if_none_match.contains(etag):
+            resp = make_response("", 304)
+            resp.set_etag(etag)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+
+    resp = jsonify(
         {
             "order_id": order_id,
             "status": data.get("status", "created"),
@@ -2867,6 +4536,10 @@ def get_order_data(order_id):
             "fulfillment": data.get("fulfillment", {}),  # ✅ NEW
         }
     )
+    if etag:
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
 
 
 # --- debug helpers ---
@@ -2893,7 +4566,7 @@ def debug_slant_ping():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
-@app.route("/debug/slant/upload/<job_id>", methods=["POST"])
+@app.route("/debug/slant/upload/<safe_id:job_id>", methods=["POST"])
 def debug_slant_upload(job_id):
     denied = _require_admin()
     if denied is not None:
@@ -2906,7 +4579,7 @@ def debug_slant_upload(job_id):
         return jsonify({"ok": False, "error": str(e), "trace": tb[:4000]}), 500
 
 
-@app.route("/debug/slant/submit/<order_id>", methods=["POST"])
+@app.route("/debug/slant/submit/<safe_id:order_id>", methods=["POST"])
 def debug_slant_submit(order_id):
     denied = _require_admin()
     if denied is not None:
@@ -2919,7 +4592,7 @@ def debug_slant_submit(order_id):
         return jsonify({"ok": False, "error": str(e), "trace": tb[:4000]}), 500
 
 
-@app.route("/debug/order/missing-stl/<order_id>", methods=["GET"])
+@app.route("/debug/order/missing-stl/<safe_id:order_id>", methods=["GET"])
 def debug_order_missing_stl(order_id):
     denied = _require_admin()
     if denied is not None:
@@ -2930,10 +4603,21 @@ def debug_order_missing_stl(order_id):
     return jsonify({"ok": True, "order_id": order_id, "missing_job_ids": missing, "upload_dir": CFG.upload_dir})
 
 
+@app.route("/debug/status/<safe_id:status>", methods=["GET"])
+def debug_orders_by_status(status):
+    denied = _require_admin()
+    if denied is not None:
+        return denied
+    order_ids = STORE.ids_by_status(status)
+    return jsonify({"ok": True, "status": status, "count": len(order_ids), "order_ids": order_ids})
+
+
 # Start the recovery scanner. render.yaml uses one Gunicorn worker.
 _start_slant_recovery_worker()
 
 
 if __name__ == "__main__":
     port = int(env_str("PORT", "10000"))
-    app.run(host="0.0.0.0", port=port)
+    # Dev server only (production runs gunicorn gthread, see render.yaml).
+    # Threaded so a slow Slant call doesn't block STL downloads or webhooks.
+    app.run(host="0.0.0.0", port=port, threaded=True, processes=1)
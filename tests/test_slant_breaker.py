@@ -0,0 +1,107 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+_TMP = tempfile.mkdtemp()
+os.environ.update(
+    {
+        "STRIPE_SECRET_KEY": "sk_test_x",
+        "STRIPE_ENDPOINT_SECRET": "whsec_x",
+        "PUBLIC_BASE_URL": "http://localhost",
+        "UPLOAD_DIR": os.path.join(_TMP, "uploads"),
+        "ORDER_DATA_PATH": os.path.join(_TMP, "order_data.json"),
+        "DAILY_QUOTA_PATH": os.path.join(_TMP, "quota.json"),
+    }
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+import server  # noqa: E402
+
+RESET_SEC = 0.05
+
+
+class _Resp:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class SlantBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = server.SlantCircuitBreaker(2, RESET_SEC)
+        self.outcomes = []
+        self.calls = 0
+        patches = [
+            mock.patch.object(server, "SLANT_BREAKER", self.breaker),
+            mock.patch.object(server.SLANT_RATE_LIMITER, "acquire", lambda: None),
+            mock.patch.object(server.SLANT, "request", self._fake_request),
+            mock.patch.object(server, "_read_bounded", lambda r, limit: None),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _fake_request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _Resp(outcome)
+
+    def _call(self):
+        return server.slant_request("GET", "https://slant.invalid/x")
+
+    def _trip(self):
+        self.outcomes = [requests.ConnectionError("down"), 502]
+        with self.assertRaises(requests.ConnectionError):
+            self._call()
+        self.assertEqual(self._call().status_code, 502)
+
+    def test_open_half_open_close(self):
+        self._trip()
+
+        # Open: fails fast with a retryable 503 and never reaches Slant.
+        with self.assertRaises(server.SlantError) as ctx:
+            self._call()
+        self.assertEqual(ctx.exception.status, 503)
+        self.assertTrue(server._is_retryable_slant_error(ctx.exception))
+        self.assertEqual(self.calls, 2)
+
+        # Half-open: one trial after the pause; a success closes the breaker.
+        time.sleep(RESET_SEC * 2)
+        self.outcomes = [200, 200]
+        self.assertEqual(self._call().status_code, 200)
+        self.assertEqual(self._call().status_code, 200)
+        self.assertIsNone(self.breaker.opened_at)
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_failed_trial_reopens(self):
+        self._trip()
+        time.sleep(RESET_SEC * 2)
+        self.outcomes = [503]
+        self.assertEqual(self._call().status_code, 503)
+        with self.assertRaises(server.SlantError):
+            self._call()
+        self.assertEqual(self.calls, 3)
+
+    def test_unexpected_trial_error_does_not_wedge_breaker(self):
+        self._trip()
+        time.sleep(RESET_SEC * 2)
+        self.outcomes = [requests.exceptions.InvalidURL("bad")]
+        with self.assertRaises(requests.exceptions.InvalidURL):
+            self._call()
+        self.assertFalse(self.breaker.trial)
+
+        time.sleep(RESET_SEC * 2)
+        self.outcomes = [200]
+        self.assertEqual(self._call().status_code, 200)
+        self.assertIsNone(self.breaker.opened_at)
+
+
+if __name__ == "__main__":
+    unittest.main()